@@ -0,0 +1,96 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LocalTokenCache:
+    """
+    Небольшой LRU-кэш токенов в памяти процесса с коротким TTL.
+    Другие процессы о сбросе не узнают, поэтому TTL ограничивает
+    время, пока удаленный токен или отключенный пользователь еще принимаются
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+local_tokens = LocalTokenCache(
+    settings.TOKEN_CACHE_LOCAL_SIZE, settings.TOKEN_CACHE_LOCAL_TTL
+)
+
+
+def token_cache_key(key: str) -> str:
+    return f"auth:token:{key}"
+
+
+def invalidate_tokens(keys) -> None:
+    keys = list(keys)
+    for key in keys:
+        local_tokens.delete(key)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id: int) -> None:
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД на каждый запрос: пользователь
+    по токену ищется в памяти процесса, затем в Redis и только потом в БД.
+    Записи сбрасываются при выходе, изменении и отключении пользователя
+    """
+
+    def authenticate_credentials(self, key):
+        cached = local_tokens.get(key)
+        if cached is None:
+            cached = cache.get(token_cache_key(key))
+            if cached is None:
+                user, token = super().authenticate_credentials(key)
+                cached = (user, token)
+                cache.set(
+                    token_cache_key(key), cached, timeout=settings.TOKEN_CACHE_TTL
+                )
+            local_tokens.set(key, cached)
+
+        # копия, чтобы изменения request.user не попали в кэш других запросов
+        user, token = cached
+        return copy.copy(user), token
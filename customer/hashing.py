@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import (check_password, identify_hasher,
+                                         make_password)
+
+
+class HashingBusy(Exception):
+    """
+    Очередь хеширования паролей заполнена, запрос нужно повторить позже
+    """
+
+
+def init_worker() -> None:
+    # при запуске процессов через spawn Django нужно настроить заново
+    import django
+
+    django.setup()
+
+
+class PasswordHasherPool:
+    """
+    Хеширование и проверка паролей (PBKDF2) в ограниченном пуле процессов.
+    Семафор ограничивает число ожидающих и выполняющихся задач: при всплеске
+    входов лишние запросы сразу получают отказ, а не занимают все воркеры.
+    Пул ограничивает нагрузку на CPU, но поток запроса по-прежнему ждет
+    результат, не дольше timeout секунд
+    """
+
+    def __init__(self, workers: int, queue_size: int, wait: float, timeout: float):
+        self.workers = workers
+        self.wait = wait
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=init_worker
+                )
+            return self.executor
+
+    def reset_executor(self, broken: ProcessPoolExecutor) -> None:
+        # процесс пула упал (например, убит OOM killer), такой пул
+        # больше не принимает задачи и создается заново
+        with self.lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, function, *args):
+        executor = self.get_executor()
+        try:
+            return executor.submit(function, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self.reset_executor(executor)
+            raise
+
+    def run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        if not self.slots.acquire(timeout=self.wait):
+            raise HashingBusy()
+        try:
+            try:
+                return self.submit(function, *args)
+            except BrokenProcessPool:
+                # задача могла попасть в уже сломанный пул, повторяем один раз
+                return self.submit(function, *args)
+        except FuturesTimeoutError:
+            raise HashingBusy()
+        finally:
+            self.slots.release()
+
+
+hasher_pool = PasswordHasherPool(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_QUEUE_SIZE,
+    settings.PASSWORD_HASH_WAIT,
+    settings.PASSWORD_HASH_TIMEOUT,
+)
+
+
+def hash_password(password: str) -> str:
+    return hasher_pool.run(make_password, password)
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    return hasher_pool.run(check_password, password, encoded)
+
+
+def verify_user_password(user, password: str) -> bool:
+    """
+    Проверяем пароль пользователя в пуле и, как ModelBackend,
+    перехешируем его, если изменились параметры хешера
+    """
+    if not verify_password(password, user.password):
+        return False
+
+    if identify_hasher(user.password).must_update(user.password):
+        user.password = hash_password(password)
+        user.save(update_fields=["password"])
+    return True
+
+
+def hash_passwords(passwords: list, workers: int) -> list:
+    """
+    Хешируем много паролей параллельно в отдельном пуле из workers процессов,
+    чтобы массовая регистрация не занимала общий пул входа пользователей
+    """
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        return list(executor.map(make_password, passwords, chunksize=16))
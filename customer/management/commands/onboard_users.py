@@ -0,0 +1,43 @@
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from customer.onboarding import (ONBOARDING_FIELDS, bulk_register_users,
+                                 validate_onboarding_rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Регистрирует неактивных пользователей из CSV-файла с колонками "
+        + ", ".join(ONBOARDING_FIELDS)
+        + " и отправляет им письма подтверждения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="CSV-файл с пользователями")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="процессов для хеширования паролей",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.ONBOARDING_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        with open(options["file"], newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+
+        errors = validate_onboarding_rows(rows)
+        if errors:
+            for error in errors:
+                self.stderr.write(str(error))
+            raise CommandError(f"Ошибок в файле: {len(errors)}")
+
+        user_ids = bulk_register_users(
+            rows, workers=options["workers"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(f"Users registered: {len(user_ids)}.")
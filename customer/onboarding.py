@@ -0,0 +1,104 @@
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from customer.hashing import hash_passwords
+from customer.models import ConfirmEmailToken, User
+from supplier.notifications import (confirmation_notification,
+                                    enqueue_notifications)
+
+PROFILE_FIELDS = ("first_name", "last_name", "company", "position")
+
+ONBOARDING_FIELDS = ("email", "password", "username") + PROFILE_FIELDS
+
+
+def validate_onboarding_rows(rows: list) -> list:
+    """
+    Проверяем строки массовой регистрации. Занятые email и username
+    ищутся двумя запросами на все строки. Возвращает список ошибок
+    """
+    errors = []
+    seen_emails = set()
+    seen_usernames = set()
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or not {"email", "password"}.issubset(row):
+            errors.append({"line": line, "Error": "Не указаны email или пароль"})
+            continue
+
+        email = User.objects.normalize_email(row["email"])
+        username = row.get("username") or email
+        if email in seen_emails or username in seen_usernames:
+            errors.append({"line": line, "email": email, "Error": "Повтор в списке"})
+        seen_emails.add(email)
+        seen_usernames.add(username)
+
+        try:
+            validate_password(row["password"])
+        except ValidationError as error:
+            errors.append({"line": line, "email": email, "Error": list(error)})
+
+    taken_emails = set(
+        User.objects.filter(email__in=seen_emails).values_list("email", flat=True)
+    )
+    taken_usernames = set(
+        User.objects.filter(username__in=seen_usernames).values_list(
+            "username", flat=True
+        )
+    )
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or "email" not in row:
+            continue
+        email = User.objects.normalize_email(row["email"])
+        if email in taken_emails or (row.get("username") or email) in taken_usernames:
+            errors.append(
+                {"line": line, "email": email, "Error": "Пользователь уже существует"}
+            )
+
+    errors.sort(key=lambda error: error["line"])
+    return errors
+
+
+def bulk_register_users(rows: list, workers: int, batch_size: int) -> list:
+    """
+    Регистрируем неактивных пользователей из проверенных строк: пароли
+    хешируются параллельно, пользователи и токены подтверждения вставляются
+    bulk_create, письма ставятся в очередь пачками. Возвращает id пользователей
+    """
+    hashes = hash_passwords([row["password"] for row in rows], workers)
+    users = [
+        User(
+            email=User.objects.normalize_email(row["email"]),
+            username=row.get("username") or User.objects.normalize_email(row["email"]),
+            password=password_hash,
+            is_active=False,
+            **{field: row.get(field, "") for field in PROFILE_FIELDS},
+        )
+        for row, password_hash in zip(rows, hashes)
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+        if any(user.pk is None for user in users):
+            # без RETURNING (старые SQLite, MySQL) id читаются отдельным запросом
+            ids = dict(
+                User.objects.filter(
+                    email__in=[user.email for user in users]
+                ).values_list("email", "id")
+            )
+            for user in users:
+                user.pk = ids[user.email]
+
+        tokens = ConfirmEmailToken.objects.bulk_create(
+            [
+                ConfirmEmailToken(user=user, key=ConfirmEmailToken.generate_key())
+                for user in users
+            ],
+            batch_size=batch_size,
+        )
+        for start in range(0, len(tokens), batch_size):
+            enqueue_notifications(
+                confirmation_notification(token.user.email, token.key)
+                for token in tokens[start : start + batch_size]
+            )
+
+    return [user.pk for user in users]
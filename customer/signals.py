@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from customer.authentication import invalidate_tokens, invalidate_user_tokens
+from customer.models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Смена пароля или отключение пользователя сбрасывает его токены в кэше
+    """
+    if not created:
+        invalidate_user_tokens(instance.id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
@@ -142,6 +142,9 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 STORAGE = "storage/"
+# готовые страницы каталога для анонимных пользователей
+CATALOG_SNAPSHOT_ROOT = os.path.join(STORAGE, "catalog")
+CATALOG_SNAPSHOT_MAX_AGE = 300
 
 AUTH_USER_MODEL = "customer.User"
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -163,7 +166,7 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "customer.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
@@ -177,6 +180,38 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# BasicAuthentication проверяет пароль (PBKDF2) на каждом запросе,
+# поэтому вне DEBUG остаются только сессии и токены
+if not DEBUG:
+    REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"] = (
+        "rest_framework.authentication.SessionAuthentication",
+        "customer.authentication.CachedTokenAuthentication",
+    )
+
+# пул процессов для хеширования паролей: число процессов (0 - в потоке
+# запроса), сколько задач может ждать и выполняться одновременно,
+# сколько секунд ждать места в очереди и результата перед ответом 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE_SIZE = 16
+PASSWORD_HASH_WAIT = 2
+PASSWORD_HASH_TIMEOUT = 10
+
+# массовая регистрация: пользователей за запрос, размер пачки вставки
+# и строк на одну задачу Celery
+ONBOARDING_MAX_USERS = 5000
+ONBOARDING_BATCH_SIZE = 500
+ONBOARDING_CHUNK_SIZE = 200
+
+# кэш токенов: TTL в Redis и в памяти процесса (сек), размер кэша в памяти
+TOKEN_CACHE_TTL = 5 * 60
+TOKEN_CACHE_LOCAL_TTL = 5
+TOKEN_CACHE_LOCAL_SIZE = 1024
+
+
+# максимальное количество товаров в запросе products/batch
+PRODUCT_BATCH_MAX_IDS = 200
+# сколько строк читать из БД за раз при выгрузке каталога
+CATALOG_EXPORT_CHUNK_SIZE = 2000
 
 REDIS_HOST = "localhost"
 REDIS_PORT = "6379"
@@ -184,6 +219,90 @@ CELERY_BROKER_URL = "redis://" + REDIS_HOST + ":" + REDIS_PORT + "/0"
 BROKER_TRANSPORT_OPTIONS = {"visibility_timeout": 3600}
 CELERY_RESULT_BACKEND = "redis://" + REDIS_HOST + ":" + REDIS_PORT + "/0"
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://" + REDIS_HOST + ":" + REDIS_PORT + "/1",
+    }
+}
+# время жизни сериализованных карточек товаров в кэше
+PRODUCT_FRAGMENT_TIMEOUT = 60 * 60
+
+# где хранить корзины покупателей: "db" (Order/OrderItem) или "redis"
+BASKET_STORE = os.getenv("BASKET_STORE", "db")
+BASKET_REDIS_URL = "redis://" + REDIS_HOST + ":" + REDIS_PORT + "/2"
+BASKET_REDIS_TTL = 60 * 60 * 24 * 7
+BASKET_FLUSH_BATCH_SIZE = 500
+
+# корзины без изменений дольше стольких дней удаляются пачками
+BASKET_ABANDONED_DAYS = 30
+BASKET_CLEANUP_BATCH_SIZE = 500
+
+# очередь писем: размер пачки, интервал сбора пачки (сек),
+# число попыток, базовая задержка повтора (сек) и срок аренды пачки воркером (сек)
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_FLUSH_INTERVAL = 5
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_DELAY = 60
+NOTIFICATION_LEASE = 10 * 60
+
+# лента заказов поставщика: изменений за ответ, максимальное ожидание
+# long-poll и интервал проверки (сек)
+ORDER_FEED_LIMIT = 100
+ORDER_FEED_MAX_WAIT = 25
+ORDER_FEED_POLL_INTERVAL = 1
+
+# максимум заказов в одном запросе смены статуса поставщиком
+ORDER_STATUS_BATCH_MAX = 500
+
+# Idempotency-Key: срок хранения ответа, блокировка выполняющегося запроса,
+# сколько ждет параллельный дубль и как часто проверяет результат (сек).
+# Блокировка должна переживать самый долгий запрос, например пакетный заказ
+# на ORDER_BULK_MAX_ITEMS позиций
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 10 * 60
+IDEMPOTENCY_WAIT = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+# ограничения одного запроса пакетного размещения заказов
+ORDER_BULK_MAX_ORDERS = 100
+ORDER_BULK_MAX_ITEMS = 20000
+
+# завершенные заказы старше стольких дней переносятся в архив командой
+# archive_orders, пачками по ORDER_ARCHIVE_BATCH_SIZE. Архивные заказы
+# не видны в истории заказов, заказах и выгрузке поставщика
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+# webhooks поставщиков: таймаут запроса, базовая и максимальная задержка
+# повтора после ошибки (сек), размер пула соединений, срок блокировки доставки (сек).
+# Адреса принимаются только https и только публичные
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_RETRY_DELAY = 30
+WEBHOOK_MAX_RETRY_DELAY = 60 * 60
+WEBHOOK_POOL_SIZE = 20
+WEBHOOK_LOCK_TIMEOUT = 5 * 60
+WEBHOOK_REQUIRE_PUBLIC_HTTPS = True
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-redis-baskets": {
+        "task": "supplier.tasks.flush_redis_baskets",
+        "schedule": 5 * 60,
+    },
+    "send-notifications": {
+        "task": "supplier.tasks.send_notifications",
+        "schedule": 30,
+    },
+    "cleanup-abandoned-baskets": {
+        "task": "supplier.tasks.cleanup_abandoned_baskets",
+        "schedule": 24 * 60 * 60,
+    },
+    "deliver-webhooks": {
+        "task": "supplier.tasks.deliver_webhooks",
+        "schedule": 5,
+    },
+}
+
 BASE_URL = "http://localhost:8000/"
 
 SPECTACULAR_SETTINGS = {
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import (Category, Order, OrderItem, Parameter, Product,
+from .models import (Category, CategoryProductCount, Notification, Order,
+                     OrderItem, Parameter, PartnerWebhook, Product,
                      ProductInfo, ProductParameter, Shop)
+from .stock import cancel_orders
 
 
 @admin.register(Shop)
@@ -14,6 +16,15 @@ class CategoryAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(CategoryProductCount)
+class CategoryProductCountAdmin(admin.ModelAdmin):
+    list_display = (
+        "category",
+        "shop",
+        "count",
+    )
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     pass
@@ -36,9 +47,41 @@ class ProductParameterAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    pass
+    actions = ("cancel_orders",)
+
+    @admin.action(description="Отменить заказы и вернуть товар на склад")
+    def cancel_orders(self, request, queryset):
+        canceled = cancel_orders(queryset.values_list("id", flat=True))
+        self.message_user(request, f"Отменено заказов: {len(canceled)}")
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = (
+        "email",
+        "subject",
+        "status",
+        "attempts",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+
+
+@admin.register(PartnerWebhook)
+class PartnerWebhookAdmin(admin.ModelAdmin):
+    list_display = (
+        "shop",
+        "url",
+        "is_active",
+        "last_change_id",
+        "failures",
+        "next_attempt_at",
+    )
+    list_filter = ("is_active",)
+    exclude = ("secret",)
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+
+from supplier.models import RESERVED_STATUSES, OrderItem, ShopSalesDaily
+
+
+def sales_rows(items):
+    """
+    Продажи позиций заказов по (магазин, товар, день заказа)
+    """
+    return (
+        items.annotate(day=TruncDate("order__dt"))
+        .values(
+            "product_info__shop_id",
+            "product_info_id",
+            "product_info__product__external_id",
+            "product_info__product__name",
+            "day",
+        )
+        .annotate(quantity=Sum("quantity"), revenue=Sum("total_amount"))
+        .values_list(
+            "product_info__shop_id",
+            "product_info_id",
+            "product_info__product__external_id",
+            "product_info__product__name",
+            "day",
+            "quantity",
+            "revenue",
+        )
+        .order_by()
+    )
+
+
+def increment_sales(rows, sign: int = 1) -> None:
+    """
+    Прибавляем продажи к дневным итогам одним INSERT ... ON CONFLICT DO UPDATE,
+    не читая текущие значения. sign=-1 вычитает продажи отмененных заказов
+    """
+    rows = [(*row, sign * quantity, sign * revenue) for *row, quantity, revenue in rows]
+    if not rows:
+        return
+
+    table = connection.ops.quote_name(ShopSalesDaily._meta.db_table)
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (shop_id, product_info_id, external_id, "
+            f"product_name, day, quantity, revenue) "
+            f"VALUES {values} "
+            f"ON CONFLICT (shop_id, product_info_id, day) DO UPDATE SET "
+            f"quantity = {table}.quantity + EXCLUDED.quantity, "
+            f"revenue = {table}.revenue + EXCLUDED.revenue",
+            [value for row in rows for value in row],
+        )
+
+
+def add_order_sales(order_ids, sign: int = 1) -> None:
+    """
+    Учитываем заказы в продажах при оформлении (sign=1) или отмене (sign=-1).
+    Вызывается в той же транзакции, что и смена статуса
+    """
+    increment_sales(sales_rows(OrderItem.objects.filter(order_id__in=order_ids)), sign)
+
+
+def rebuild_shop_sales(shop_id: int, batch_size: int) -> int:
+    """
+    Пересчитываем продажи магазина по всей истории заказов
+    """
+    items = OrderItem.objects.filter(
+        product_info__shop_id=shop_id, order__status__in=RESERVED_STATUSES
+    )
+    rows = 0
+    with transaction.atomic():
+        # продажи удаленных товаров пересчитать уже не из чего, их оставляем
+        ShopSalesDaily.objects.filter(
+            shop_id=shop_id, product_info__isnull=False
+        ).delete()
+        batch = []
+        for row in sales_rows(items).iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                increment_sales(batch)
+                rows += len(batch)
+                batch = []
+        increment_sales(batch)
+        rows += len(batch)
+    return rows
+
+
+def period_totals(sales) -> dict:
+    totals = sales.aggregate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+    return {
+        "quantity": totals["quantity"] or 0,
+        "revenue": totals["revenue"] or 0,
+    }
+
+
+def change_percent(current: int, previous: int):
+    if not previous:
+        return None
+    return round((current - previous) * 100 / previous, 2)
+
+
+def previous_period(date_from, date_to):
+    """
+    Период той же длины перед date_from. Для дат у начала календаря
+    выбрасывает OverflowError
+    """
+    return date_from - (date_to - date_from + timedelta(days=1)), date_from
+
+
+def shop_sales_report(shop_id: int, date_from, date_to, top: int) -> dict:
+    """
+    Отчет о продажах магазина за период только по дневным итогам:
+    итоги, выручка по дням, лучшие товары и сравнение с предыдущим периодом
+    """
+    sales = ShopSalesDaily.objects.filter(
+        shop_id=shop_id, day__gte=date_from, day__lte=date_to
+    )
+    previous_from, previous_to = previous_period(date_from, date_to)
+    previous_sales = ShopSalesDaily.objects.filter(
+        shop_id=shop_id, day__gte=previous_from, day__lt=previous_to
+    )
+
+    total = period_totals(sales)
+    previous = period_totals(previous_sales)
+    daily = (
+        sales.values("day")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("day")
+    )
+    # товар после повторной загрузки прайса получает новый ProductInfo,
+    # поэтому лучшие товары считаем по внешнему id
+    top_products = (
+        sales.values("external_id", "product_name")
+        .annotate(
+            product_info_id=Max("product_info_id"),
+            quantity=Sum("quantity"),
+            revenue=Sum("revenue"),
+        )
+        .order_by("-revenue", "external_id")[:top]
+    )
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "total": total,
+        "previous": {
+            **previous,
+            "quantity_change": change_percent(total["quantity"], previous["quantity"]),
+            "revenue_change": change_percent(total["revenue"], previous["revenue"]),
+        },
+        "daily": list(daily),
+        "top_products": [
+            {
+                "product_info": row["product_info_id"],
+                "external_id": row["external_id"],
+                "name": row["product_name"],
+                "quantity": row["quantity"],
+                "revenue": row["revenue"],
+            }
+            for row in top_products
+        ],
+    }
@@ -0,0 +1,117 @@
+from datetime import datetime, time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from supplier.models import Order, OrderChange, OrderItem
+
+# заказы в этих статусах больше не меняются и могут уйти в архив.
+# Архивные заказы не читаются API: история заказов покупателя, заказы
+# и выгрузка поставщика показывают только заказы из основных таблиц
+ARCHIVE_STATUSES = ("delivered", "canceled")
+
+
+class ArchiveNotSupported(Exception):
+    """
+    Архивирование использует возможности PostgreSQL
+    """
+
+
+def check_archive_supported() -> None:
+    if connection.vendor != "postgresql":
+        raise ArchiveNotSupported("Архивирование поддерживается только в PostgreSQL")
+
+
+def archive_table_name(model, month) -> str:
+    return f"{model._meta.db_table}_archive_{month:%Y_%m}"
+
+
+def create_archive_table(model, month, tablespace: str = None) -> str:
+    """
+    Создаем месячную таблицу архива со структурой таблицы модели,
+    но без внешних ключей. Таблицу можно вынести в отдельный tablespace
+    """
+    quote = connection.ops.quote_name
+    table = archive_table_name(model, month)
+    sql = (
+        f"CREATE TABLE IF NOT EXISTS {quote(table)} "
+        f"(LIKE {quote(model._meta.db_table)} INCLUDING ALL)"
+    )
+    if tablespace:
+        sql += f" TABLESPACE {quote(tablespace)}"
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+    return table
+
+
+def copy_rows(model, table: str, column: str, ids) -> None:
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in model._meta.concrete_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(table)} ({columns}) "
+            f"SELECT {columns} FROM {quote(model._meta.db_table)} "
+            f"WHERE {quote(column)} = ANY(%s)",
+            [list(ids)],
+        )
+
+
+def delete_rows(model, column: str, ids) -> None:
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} = ANY(%s)",
+            [list(ids)],
+        )
+
+
+def month_bounds(month) -> tuple:
+    start = timezone.make_aware(datetime.combine(month.replace(day=1), time.min))
+    if month.month == 12:
+        end = start.replace(year=month.year + 1, month=1)
+    else:
+        end = start.replace(month=month.month + 1)
+    return start, end
+
+
+def archivable_months(before) -> list:
+    return list(
+        Order.objects.filter(status__in=ARCHIVE_STATUSES, dt__lt=before)
+        .dates("dt", "month")
+        .order_by("dt")
+    )
+
+
+def archive_month(month, before, batch_size: int, tablespace: str = None) -> int:
+    """
+    Переносим завершенные заказы месяца month старше before с их позициями
+    в архивные таблицы пачками по batch_size, каждая пачка - своя транзакция.
+    Журнал изменений удаляется, дневные итоги продаж остаются.
+    Возвращает количество перенесенных заказов
+    """
+    check_archive_supported()
+
+    order_table = create_archive_table(Order, month, tablespace)
+    item_table = create_archive_table(OrderItem, month, tablespace)
+    start, end = month_bounds(month)
+    orders = Order.objects.filter(
+        status__in=ARCHIVE_STATUSES, dt__gte=start, dt__lt=min(end, before)
+    ).order_by("id")
+
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                orders.select_for_update(skip_locked=True).values_list("id", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not ids:
+                return archived
+
+            copy_rows(Order, order_table, "id", ids)
+            copy_rows(OrderItem, item_table, "order_id", ids)
+            OrderChange.objects.filter(order_id__in=ids).delete()
+            delete_rows(OrderItem, "order_id", ids)
+            delete_rows(Order, "id", ids)
+        archived += len(ids)
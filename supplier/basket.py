@@ -0,0 +1,377 @@
+import logging
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from supplier.models import Order, OrderItem, ProductInfo, Shop
+
+logger = logging.getLogger(__name__)
+
+# пользователи, корзины которых изменились после последней записи в БД
+DIRTY_BASKETS_KEY = "basket:dirty"
+
+
+def resolve_basket_items(items, product_infos: dict = None) -> tuple:
+    """
+    Проверяем позиции корзины вида {"id": <id продукта>, "quantity": <кол-во>}.
+    Все товары загружаются одним запросом, ошибки собираются по всем строкам.
+    Уже загруженные товары можно передать в product_infos {id продукта: ProductInfo}.
+    Возвращает ({ProductInfo: количество}, [ошибки])
+    """
+    errors = []
+    quantities = {}
+    for line, item in enumerate(items, start=1):
+        product_id = item.get("id") if isinstance(item, dict) else None
+        quantity = item.get("quantity") if isinstance(item, dict) else None
+        if (
+            isinstance(product_id, int)
+            and isinstance(quantity, int)
+            and not isinstance(quantity, bool)
+            and quantity > 0
+        ):
+            quantities[product_id] = quantity
+        else:
+            errors.append(
+                {"line": line, "id": product_id, "Error": "Неверный формат данных"}
+            )
+
+    if product_infos is None:
+        product_infos = {
+            product_info.product_id: product_info
+            for product_info in ProductInfo.objects.filter(product_id__in=quantities)
+        }
+    for line, item in enumerate(items, start=1):
+        product_id = item.get("id") if isinstance(item, dict) else None
+        if product_id in quantities and product_id not in product_infos:
+            errors.append(
+                {
+                    "line": line,
+                    "id": product_id,
+                    "Error": f"Товар с id {product_id} не найден",
+                }
+            )
+
+    errors.sort(key=lambda error: error["line"])
+    resolved = {
+        product_infos[product_id]: quantity
+        for product_id, quantity in quantities.items()
+        if product_id in product_infos
+    }
+    return resolved, errors
+
+
+def upsert_basket_items(order, quantities: dict) -> int:
+    """
+    Добавляем позиции в заказ одним INSERT ... ON CONFLICT по unique_order_item
+    """
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(
+                order=order,
+                product_info=product_info,
+                quantity=quantity,
+                price=product_info.price,
+                total_amount=product_info.price * quantity,
+            )
+            for product_info, quantity in quantities.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["order", "product_info"],
+        update_fields=["quantity", "price", "total_amount"],
+    )
+    return len(quantities)
+
+
+def refresh_order_totals(order_ids) -> None:
+    """
+    Пересчитываем сохраненные итоги заказов одним UPDATE.
+    Вызывается в той же транзакции, что и изменение позиций
+    """
+    items = OrderItem.objects.filter(order_id=OuterRef("pk")).values("order_id")
+    Order.objects.filter(id__in=order_ids).update(
+        updated_at=timezone.now(),
+        total_sum=Coalesce(
+            Subquery(items.annotate(total=Sum("total_amount")).values("total")), 0
+        ),
+        total_quantity=Coalesce(
+            Subquery(items.annotate(total=Sum("quantity")).values("total")), 0
+        ),
+    )
+
+
+def reorder_filters() -> tuple:
+    """
+    Условия (доступна, недоступна) для позиций прошлого заказа:
+    магазин принимает заказы и на складе хватает товара
+    """
+    available = Q(product_info__shop__state=True) & Q(
+        product_info__quantity__gte=F("quantity")
+    )
+    return available, ~available
+
+
+def unavailable_reorder_items(order_id: int) -> list:
+    _, unavailable = reorder_filters()
+    return list(
+        OrderItem.objects.filter(unavailable, order_id=order_id)
+        .values(
+            "product_info_id",
+            "quantity",
+            model=F("product_info__model"),
+            available=F("product_info__quantity"),
+        )
+        .order_by("product_info_id")
+    )
+
+
+def reorder_into_basket(order_id: int, basket) -> tuple:
+    """
+    Копируем доступные позиции заказа в корзину по текущим ценам
+    одним INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+    Возвращает (количество скопированных позиций, [недоступные позиции])
+    """
+    quote = connection.ops.quote_name
+    items = quote(OrderItem._meta.db_table)
+    product_infos = quote(ProductInfo._meta.db_table)
+    shops = quote(Shop._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {items} "
+                f"(order_id, product_info_id, quantity, price, total_amount) "
+                f"SELECT %s, item.product_info_id, item.quantity, "
+                f"product_info.price, product_info.price * item.quantity "
+                f"FROM {items} item "
+                f"JOIN {product_infos} product_info "
+                f"ON product_info.id = item.product_info_id "
+                f"JOIN {shops} shop ON shop.id = product_info.shop_id "
+                f"WHERE item.order_id = %s AND shop.state "
+                f"AND product_info.quantity >= item.quantity "
+                f"ON CONFLICT (order_id, product_info_id) DO UPDATE SET "
+                f"quantity = EXCLUDED.quantity, price = EXCLUDED.price, "
+                f"total_amount = EXCLUDED.total_amount",
+                [basket.id, order_id],
+            )
+            copied = cursor.rowcount
+        refresh_order_totals([basket.id])
+    return copied, unavailable_reorder_items(order_id)
+
+
+def redis_basket_enabled() -> bool:
+    return settings.BASKET_STORE == "redis"
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.BASKET_REDIS_URL)
+
+
+def parse_basket_hash(values: dict) -> dict:
+    return {
+        int(product_info_id): int(quantity)
+        for product_info_id, quantity in values.items()
+    }
+
+
+class RedisBasket:
+    """
+    Корзина пользователя в Redis: hash basket:<user_id> {id ProductInfo: количество}.
+    В Order/OrderItem переносится только при оформлении заказа
+    или периодической выгрузкой flush_redis_baskets
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.key = f"basket:{user_id}"
+        self.client = get_redis()
+
+    def touch(self, pipeline) -> None:
+        pipeline.expire(self.key, settings.BASKET_REDIS_TTL)
+        pipeline.sadd(DIRTY_BASKETS_KEY, self.user_id)
+
+    def set_items(self, quantities: dict) -> int:
+        with self.client.pipeline() as pipeline:
+            pipeline.hset(
+                self.key,
+                mapping={
+                    product_info.id: quantity
+                    for product_info, quantity in quantities.items()
+                },
+            )
+            self.touch(pipeline)
+            pipeline.execute()
+        return len(quantities)
+
+    def remove_items(self, product_info_ids) -> int:
+        with self.client.pipeline() as pipeline:
+            pipeline.hdel(self.key, *product_info_ids)
+            pipeline.exists(self.key)
+            self.touch(pipeline)
+            deleted, exists = pipeline.execute()[:2]
+        if deleted and not exists:
+            # пустой hash Redis удаляет сам, и его не отличить от истекшего,
+            # поэтому опустевшую корзину сразу очищаем и в БД
+            self.delete_saved_items()
+        return deleted
+
+    def saved_items(self) -> dict:
+        return dict(
+            OrderItem.objects.filter(
+                order__user_id=self.user_id, order__status="basket"
+            ).values_list("product_info_id", "quantity")
+        )
+
+    def delete_saved_items(self) -> None:
+        with transaction.atomic():
+            basket_ids = list(
+                Order.objects.filter(user_id=self.user_id, status="basket").values_list(
+                    "id", flat=True
+                )
+            )
+            OrderItem.objects.filter(order_id__in=basket_ids).delete()
+            refresh_order_totals(basket_ids)
+
+    def items(self) -> dict:
+        """
+        Позиции корзины. Если hash истек, корзина восстанавливается
+        из последней записи в БД
+        """
+        items = parse_basket_hash(self.client.hgetall(self.key))
+        if not items:
+            items = self.saved_items()
+            if items:
+                with self.client.pipeline() as pipeline:
+                    pipeline.hset(self.key, mapping=items)
+                    pipeline.expire(self.key, settings.BASKET_REDIS_TTL)
+                    pipeline.execute()
+        return items
+
+    def clear(self, items: dict) -> None:
+        """
+        Убираем из корзины оформленные позиции items.
+        Позиции, добавленные или измененные после чтения items, остаются
+        """
+        with self.client.pipeline() as pipeline:
+            while True:
+                try:
+                    pipeline.watch(self.key)
+                    current = parse_basket_hash(pipeline.hgetall(self.key))
+                    ordered = [
+                        product_info_id
+                        for product_info_id, quantity in current.items()
+                        if items.get(product_info_id) == quantity
+                    ]
+                    pipeline.multi()
+                    if len(ordered) == len(current):
+                        pipeline.delete(self.key)
+                        pipeline.srem(DIRTY_BASKETS_KEY, self.user_id)
+                    elif ordered:
+                        pipeline.hdel(self.key, *ordered)
+                        self.touch(pipeline)
+                    pipeline.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+    def materialize(self, items: dict = None) -> Order:
+        """
+        Переносим корзину из Redis в Order(status="basket") и его позиции
+        """
+        if items is None:
+            items = self.items()
+        with transaction.atomic():
+            basket, _ = Order.objects.get_or_create(
+                user_id=self.user_id, status="basket"
+            )
+            if items:
+                OrderItem.objects.filter(order=basket).exclude(
+                    product_info_id__in=items
+                ).delete()
+                upsert_basket_items(
+                    basket,
+                    {
+                        product_info: items[product_info.id]
+                        for product_info in ProductInfo.objects.filter(
+                            id__in=items
+                        ).only("id", "price")
+                    },
+                )
+            refresh_order_totals([basket.id])
+        return basket
+
+    def flush(self) -> bool:
+        """
+        Записываем корзину в БД и снимаем отметку об изменении.
+        Если корзину изменили во время записи, отметка остается
+        до следующей выгрузки. Возвращает, снята ли отметка
+        """
+        with self.client.pipeline() as pipeline:
+            pipeline.watch(self.key)
+            items = parse_basket_hash(pipeline.hgetall(self.key))
+            # истекший hash не затирает корзину в БД
+            if items:
+                self.materialize(items)
+            pipeline.multi()
+            pipeline.srem(DIRTY_BASKETS_KEY, self.user_id)
+            try:
+                pipeline.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+
+def flush_dirty_baskets(batch_size: int) -> int:
+    """
+    Записываем в БД измененные корзины, не более batch_size за раз.
+    Отметка снимается только после записи, поэтому при ошибке
+    корзина будет записана следующей выгрузкой
+    """
+    flushed = 0
+    for user_id in get_redis().srandmember(DIRTY_BASKETS_KEY, batch_size):
+        try:
+            flushed += RedisBasket(int(user_id)).flush()
+        except Exception:
+            logger.exception(f"Error flushing basket of user {int(user_id)}")
+    return flushed
+
+
+def delete_abandoned_baskets(before, batch_size: int) -> tuple:
+    """
+    Удаляем корзины, не менявшиеся с before, пачками по batch_size.
+    Каждая пачка - короткая транзакция, занятые строки пропускаются.
+    Возвращает (удалено корзин, удалено позиций)
+    """
+    baskets = Order.objects.filter(status="basket", updated_at__lt=before)
+    deleted_orders = deleted_items = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                baskets.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted_orders, deleted_items
+
+            deleted_items += OrderItem.objects.filter(order_id__in=ids).delete()[0]
+            deleted_orders += Order.objects.filter(id__in=ids).delete()[0]
+
+
+def reorder_into_redis_basket(order_id: int, user_id: int) -> tuple:
+    """
+    То же для корзины в Redis: доступные позиции читаются одним запросом
+    """
+    available, _ = reorder_filters()
+    quantities = {
+        item.product_info: item.quantity
+        for item in OrderItem.objects.filter(available, order_id=order_id)
+        .select_related("product_info")
+        .only("quantity", "product_info__id")
+    }
+    copied = RedisBasket(user_id).set_items(quantities) if quantities else 0
+    return copied, unavailable_reorder_items(order_id)
@@ -0,0 +1,236 @@
+import gzip
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from supplier.models import (Category, CategoryProductCount, ProductInfo,
+                             ProductParameter, Shop)
+from supplier.serializers import ProductInfoSerializer
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен, тогда отдаем только gzip
+    brotli = None
+
+# ссылка на последнюю собранную версию снимков каталога
+SNAPSHOT_CURRENT = "current"
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def refresh_category_counts(shop_id: int) -> None:
+    """
+    Пересчитываем количество товаров магазина по категориям.
+    Вызывается после загрузки прайса, чтобы список категорий
+    не считал товары при каждом запросе
+    """
+    counts = (
+        ProductInfo.objects.filter(shop_id=shop_id)
+        .values("product__category_id")
+        .annotate(count=Count("id"))
+    )
+    CategoryProductCount.objects.filter(shop_id=shop_id).delete()
+    CategoryProductCount.objects.bulk_create(
+        CategoryProductCount(
+            category_id=row["product__category_id"],
+            shop_id=shop_id,
+            count=row["count"],
+        )
+        for row in counts
+    )
+
+
+def get_catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> None:
+    """
+    Новая версия каталога делает недействительными все карточки товаров в кэше.
+    Версия берется из времени, чтобы не повторить старую после очистки Redis
+    """
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def product_fragment_key(product_id: int, version: int) -> str:
+    return f"product:{version}:{product_id}"
+
+
+def get_product_fragments(product_ids: list, serialize) -> list:
+    """
+    Собираем сериализованные карточки товаров из кэша одним MGET.
+    Отсутствующие в кэше сериализуются функцией serialize(ids) и сохраняются
+    """
+    version = get_catalog_version()
+    keys = {
+        product_id: product_fragment_key(product_id, version)
+        for product_id in product_ids
+    }
+    fragments = cache.get_many(keys.values())
+
+    missing = [
+        product_id for product_id in product_ids if keys[product_id] not in fragments
+    ]
+    if missing:
+        fresh = {keys[item["id"]]: dict(item) for item in serialize(missing)}
+        cache.set_many(fresh, timeout=settings.PRODUCT_FRAGMENT_TIMEOUT)
+        fragments.update(fresh)
+
+    return [
+        fragments[keys[product_id]]
+        for product_id in product_ids
+        if keys[product_id] in fragments
+    ]
+
+
+def invalidate_product_fragments(product_ids) -> None:
+    version = get_catalog_version()
+    cache.delete_many(
+        [product_fragment_key(product_id, version) for product_id in product_ids]
+    )
+
+
+def snapshot_page_url(scope: str, page: int) -> str:
+    return f"{settings.BASE_URL}api/catalog/{scope}/{page}"
+
+
+def write_snapshot_file(path: Path, content: bytes) -> None:
+    path.write_bytes(content)
+    path.with_name(path.name + ".gz").write_bytes(gzip.compress(content))
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(content))
+
+
+def write_snapshot_scope(build_dir: Path, scope: str, queryset) -> None:
+    """
+    Записываем страницы одного среза каталога в формате ответа ProductInfoView
+    """
+    page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    count = queryset.count()
+    pages = max((count + page_size - 1) // page_size, 1)
+    scope_dir = build_dir / scope
+    scope_dir.mkdir(parents=True)
+
+    renderer = JSONRenderer()
+    results = []
+    page = 1
+
+    def flush():
+        content = renderer.render(
+            {
+                "count": count,
+                "next": snapshot_page_url(scope, page + 1) if page < pages else None,
+                "previous": snapshot_page_url(scope, page - 1) if page > 1 else None,
+                "results": results,
+            }
+        )
+        write_snapshot_file(scope_dir / f"{page}.json", content)
+
+    for product_info in queryset.iterator(chunk_size=page_size):
+        results.append(ProductInfoSerializer(product_info).data)
+        if len(results) == page_size:
+            flush()
+            results = []
+            page += 1
+
+    if results or page == 1:
+        flush()
+
+
+def catalog_snapshot_queryset():
+    return (
+        ProductInfo.objects.filter(shop__state=True)
+        .select_related("product__category")
+        .prefetch_related(
+            Prefetch(
+                "product_parameters",
+                queryset=ProductParameter.objects.select_related("parameter"),
+            )
+        )
+        .order_by("id")
+    )
+
+
+def shop_snapshot_scopes(shop_id: int) -> list:
+    """
+    Срезы каталога, которые меняются вместе с товарами магазина.
+    Категории берем из связи магазина: при загрузке прайса она только
+    пополняется, поэтому покрывает и категории удаленных товаров
+    """
+    category_ids = set(
+        Category.objects.filter(shops__id=shop_id).values_list("id", flat=True)
+    )
+    category_ids.update(
+        ProductInfo.objects.filter(shop_id=shop_id).values_list(
+            "product__category_id", flat=True
+        )
+    )
+    return ["all", f"shop-{shop_id}"] + [
+        f"category-{category_id}" for category_id in sorted(category_ids)
+    ]
+
+
+def write_scope(build_dir: Path, scope: str, queryset) -> None:
+    kind, _, scope_id = scope.partition("-")
+    if kind == "shop":
+        if not Shop.objects.filter(id=scope_id, state=True).exists():
+            return
+        queryset = queryset.filter(shop_id=scope_id)
+    elif kind == "category":
+        queryset = queryset.filter(product__category_id=scope_id)
+    write_snapshot_scope(build_dir, scope, queryset)
+
+
+def write_catalog_snapshots(shop_id: int = None) -> str:
+    """
+    Собираем снимки каталога для анонимных пользователей: все товары,
+    по магазинам и по категориям. Каждая сборка пишется в отдельный каталог,
+    после чего ссылка current атомарно переключается на нее.
+    Если указан shop_id и предыдущая сборка есть, пересобираются только срезы
+    этого магазина, остальные файлы переносятся из нее жесткими ссылками
+    """
+    root = Path(settings.CATALOG_SNAPSHOT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    build = str(time.time_ns())
+    build_dir = root / build
+    link = root / SNAPSHOT_CURRENT
+    queryset = catalog_snapshot_queryset()
+
+    if shop_id is not None and link.is_dir():
+        shutil.copytree(link.resolve(), build_dir, copy_function=os.link)
+        for scope in shop_snapshot_scopes(shop_id):
+            # файлы предыдущей сборки не перезаписываем, а только отвязываем
+            shutil.rmtree(build_dir / scope, ignore_errors=True)
+            write_scope(build_dir, scope, queryset)
+    else:
+        write_snapshot_scope(build_dir, "all", queryset)
+        for scope_shop_id in Shop.objects.filter(state=True).values_list(
+            "id", flat=True
+        ):
+            write_scope(build_dir, f"shop-{scope_shop_id}", queryset)
+        for category_id in Category.objects.values_list("id", flat=True):
+            write_scope(build_dir, f"category-{category_id}", queryset)
+
+    tmp_link = root / f"{SNAPSHOT_CURRENT}.{build}"
+    os.symlink(build, tmp_link)
+    os.replace(tmp_link, link)
+
+    # старые сборки удаляем, оставляя предыдущую для уже начатых запросов
+    builds = sorted(
+        (path for path in root.iterdir() if path.is_dir() and not path.is_symlink()),
+        key=lambda path: int(path.name),
+    )
+    for old_build in builds[:-2]:
+        shutil.rmtree(old_build, ignore_errors=True)
+
+    return build
@@ -0,0 +1,79 @@
+import csv
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Iterator
+
+from openpyxl import Workbook
+from ujson import dumps as dump_json
+
+# размер блока, которым данные отдаются клиенту
+CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer: возвращает записанную строку вместо хранения
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield dump_json(row, ensure_ascii=False) + "\n"
+
+
+def iter_csv(rows: Iterable[dict], fieldnames: Iterable[str]) -> Iterator[str]:
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_chunks(lines: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Собирает строки в блоки по size байт, чтобы не отдавать их по одной
+    """
+    buffer = []
+    buffered = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_xlsx(rows: Iterable[dict], fieldnames: Iterable[str], file: BinaryIO):
+    """
+    Пишет строки в xlsx в режиме write_only: строки не держатся в памяти,
+    а сразу уходят во временный файл листа
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(fieldnames))
+    for row in rows:
+        sheet.append(
+            [
+                # Excel не хранит часовой пояс, время выгружается в UTC
+                value.astimezone(timezone.utc).replace(tzinfo=None)
+                if isinstance(value, datetime) and value.tzinfo
+                else value
+                for value in (row[field] for field in fieldnames)
+            ]
+        )
+    workbook.save(file)
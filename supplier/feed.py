@@ -0,0 +1,126 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Prefetch
+from django.db.models.expressions import RawSQL
+
+from supplier.models import Order, OrderChange, OrderItem
+
+
+def change_key() -> str:
+    """
+    Поле курсора ленты. В PostgreSQL id выдаются до коммита и транзакции
+    коммитятся не по порядку id, поэтому курсор - номер транзакции xid.
+    В SQLite запись сериализована, и порядок id совпадает с порядком коммитов
+    """
+    return "xid" if connection.vendor == "postgresql" else "id"
+
+
+def current_xid():
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_current_xact_id()::text::bigint")
+        return cursor.fetchone()[0]
+
+
+def record_order_changes(order_ids) -> int:
+    """
+    Записываем в журнал текущий статус заказов для каждого магазина,
+    чьи товары в них есть. Вызывается в той же транзакции, что и изменение
+    """
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list("order_id", "product_info__shop_id", "order__status")
+        .distinct()
+    )
+    xid = current_xid()
+    changes = OrderChange.objects.bulk_create(
+        OrderChange(order_id=order_id, shop_id=shop_id, status=order_status, xid=xid)
+        for order_id, shop_id, order_status in rows
+    )
+    return len(changes)
+
+
+def visible_changes(shop_id: int, since: int):
+    changes = OrderChange.objects.filter(
+        shop_id=shop_id, **{f"{change_key()}__gt": since}
+    )
+    if connection.vendor == "postgresql":
+        # отдаем только транзакции старше самой старой незавершенной:
+        # все будущие коммиты получат xid не меньше этой границы,
+        # поэтому курсор не обгонит еще не видимые изменения
+        changes = changes.filter(
+            xid__lt=RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", [])
+        )
+    return changes
+
+
+def last_cursor(shop_id: int) -> int:
+    """
+    Текущая позиция ленты магазина: с нее отдаются только новые изменения
+    """
+    key = change_key()
+    cursor = OrderChange.objects.filter(shop_id=shop_id).aggregate(cursor=Max(key))
+    return cursor["cursor"] or 0
+
+
+def wait_for_changes(shop_id: int, since: int, wait: float) -> bool:
+    """
+    Ждем появления изменений не дольше wait секунд
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        if visible_changes(shop_id, since).exists():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(settings.ORDER_FEED_POLL_INTERVAL, remaining))
+
+
+def get_order_feed(shop_id: int, since: int) -> tuple:
+    """
+    Заказы магазина, измененные после курсора since, только с его позициями.
+    Возвращает (новый курсор, заказы)
+    """
+    limit = settings.ORDER_FEED_LIMIT
+    changes = (
+        visible_changes(shop_id, since)
+        .values("order_id")
+        .annotate(last_change=Max(change_key()))
+        .order_by("last_change", "order_id")
+    )
+    rows = list(changes[: limit + 1])
+    if len(rows) > limit:
+        boundary = rows[limit - 1]["last_change"]
+        if rows[limit]["last_change"] != boundary:
+            rows = rows[:limit]
+        else:
+            # курсор нельзя ставить внутри транзакции: ее заказы
+            # отдаются целиком в этом ответе или в следующем
+            rows = [row for row in rows if row["last_change"] < boundary] or list(
+                changes.filter(last_change__lte=boundary)
+            )
+    last_changes = {row["order_id"]: row["last_change"] for row in rows}
+    if not last_changes:
+        return since, []
+
+    orders = (
+        Order.objects.filter(id__in=last_changes)
+        .select_related("contact")
+        .prefetch_related(
+            Prefetch(
+                "ordered_items",
+                queryset=OrderItem.objects.filter(
+                    product_info__shop_id=shop_id
+                ).prefetch_related(
+                    "product_info__product__category",
+                    "product_info__product_parameters__parameter",
+                ),
+            )
+        )
+    )
+    orders = sorted(orders, key=lambda order: (last_changes[order.id], order.id))
+    return max(last_changes.values()), orders
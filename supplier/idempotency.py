@@ -0,0 +1,117 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+from ujson import dumps as dump_json
+
+from supplier.locks import acquire_cache_lock, release_cache_lock
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def idempotency_cache_key(request, key: str) -> str:
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{request.user.id}:{request.method}:{request.path}:{digest}"
+
+
+def request_fingerprint(request) -> str:
+    body = dump_json(request.data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def store_response(response, fingerprint: str) -> dict:
+    if isinstance(response, Response):
+        return {
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "data": response.data,
+        }
+    return {
+        "fingerprint": fingerprint,
+        "status": response.status_code,
+        "content": response.content,
+        "content_type": response["Content-Type"],
+    }
+
+
+def replay_response(stored: dict):
+    if "data" in stored:
+        response = Response(stored["data"], status=stored["status"])
+    else:
+        response = HttpResponse(
+            stored["content"],
+            status=stored["status"],
+            content_type=stored["content_type"],
+        )
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(handler):
+    """
+    Повтор запроса с тем же заголовком Idempotency-Key получает сохраненный
+    ответ первого запроса без повторного выполнения. Параллельный дубль ждет
+    завершения первого запроса. Ключ с другим телом запроса отклоняется
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return JsonResponse(
+                {"Status": False, "Errors": f"Слишком длинный {IDEMPOTENCY_HEADER}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = idempotency_cache_key(request, key)
+        lock_key = f"{cache_key}:lock"
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while True:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                if stored["fingerprint"] != fingerprint:
+                    return JsonResponse(
+                        {
+                            "Status": False,
+                            "Errors": f"{IDEMPOTENCY_HEADER} уже использован "
+                            f"с другими данными",
+                        },
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return replay_response(stored)
+
+            token = acquire_cache_lock(lock_key, settings.IDEMPOTENCY_LOCK_TIMEOUT)
+            if token is not None:
+                break
+
+            if time.monotonic() >= deadline:
+                return JsonResponse(
+                    {"Status": False, "Errors": "Запрос с этим ключом еще выполняется"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+            # ошибки сервера не сохраняем, чтобы повтор мог выполниться заново
+            if response.status_code < 500:
+                cache.set(
+                    cache_key,
+                    store_response(response, fingerprint),
+                    timeout=settings.IDEMPOTENCY_TTL,
+                )
+            return response
+        finally:
+            release_cache_lock(lock_key, token)
+
+    return wrapper
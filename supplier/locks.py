@@ -0,0 +1,22 @@
+import secrets
+
+from django.core.cache import cache
+
+
+def acquire_cache_lock(key: str, timeout: int):
+    """
+    Берем блокировку в кэше. Возвращает токен владельца или None,
+    если блокировка уже занята
+    """
+    token = secrets.token_hex(16)
+    if cache.add(key, token, timeout=timeout):
+        return token
+    return None
+
+
+def release_cache_lock(key: str, token: str) -> None:
+    # блокировка могла истечь и достаться другому процессу,
+    # поэтому удаляем ее, только если она все еще наша
+    if cache.get(key) == token:
+        cache.delete(key)
+
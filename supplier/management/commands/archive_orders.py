@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from supplier.archive import (ArchiveNotSupported, archivable_months,
+                              archive_month, check_archive_supported)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит завершенные заказы старше ORDER_ARCHIVE_AFTER_DAYS дней "
+        "в помесячные архивные таблицы (только PostgreSQL). "
+        "Архивные заказы больше не отдаются API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE
+        )
+        parser.add_argument("--tablespace", help="tablespace для архивных таблиц")
+
+    def handle(self, *args, **options):
+        try:
+            check_archive_supported()
+        except ArchiveNotSupported as error:
+            raise CommandError(str(error))
+
+        before = timezone.now() - timedelta(days=options["days"])
+        total = 0
+        for month in archivable_months(before):
+            archived = archive_month(
+                month, before, options["batch_size"], options["tablespace"]
+            )
+            total += archived
+            self.stdout.write(f"{month:%Y-%m}: {archived} orders archived.")
+        self.stdout.write(f"Orders archived: {total}.")
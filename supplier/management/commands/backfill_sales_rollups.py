@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from supplier.analytics import rebuild_shop_sales
+from supplier.models import Shop
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает дневные итоги продаж магазинов по истории заказов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="id магазина, по умолчанию все")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        shops = Shop.objects.order_by("id")
+        if options["shop"]:
+            shops = shops.filter(id=options["shop"])
+
+        # каждый магазин пересчитывается в своей транзакции
+        for shop_id in shops.values_list("id", flat=True):
+            rows = rebuild_shop_sales(shop_id, options["batch_size"])
+            self.stdout.write(f"Shop {shop_id}: {rows} daily rows.")
+        self.stdout.write("Sales rollups rebuilt.")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from supplier.catalog import refresh_category_counts
+from supplier.models import Shop
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает количество товаров по категориям для всех магазинов"
+
+    def handle(self, *args, **options):
+        for shop_id in Shop.objects.values_list("id", flat=True):
+            refresh_category_counts(shop_id)
+        self.stdout.write("Category product counts refreshed.")
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.utils import timezone
 
 from customer.models import Contact, User
 
@@ -16,6 +17,16 @@ STATUS_CHOICES = (
     ("canceled", "Отменен"),
 )
 
+# статусы, в которых товар заказа списан со склада и учтен в продажах
+RESERVED_STATUSES = ("new", "confirmed", "assembled", "sent", "delivered")
+
+NOTIFICATION_STATUS_CHOICES = (
+    ("pending", "Ожидает отправки"),
+    ("sending", "Отправляется"),
+    ("sent", "Отправлено"),
+    ("failed", "Ошибка отправки"),
+)
+
 
 class Shop(models.Model):
     name = models.CharField(max_length=50, verbose_name="Название магазина")
@@ -56,6 +67,34 @@ class Category(models.Model):
         return self.name
 
 
+class CategoryProductCount(models.Model):
+    category = models.ForeignKey(
+        Category,
+        verbose_name="Категория",
+        related_name="product_counts",
+        on_delete=models.CASCADE,
+    )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="category_counts",
+        on_delete=models.CASCADE,
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество товаров")
+
+    class Meta:
+        verbose_name = "Количество товаров в категории"
+        verbose_name_plural = "Количество товаров по категориям"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "shop"], name="unique_category_product_count"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category} - {self.shop.name}: {self.count}"
+
+
 class Product(models.Model):
     external_id = models.PositiveIntegerField(
         verbose_name="Внешний ID продукта", unique=True, default=0
@@ -178,14 +217,35 @@ class Order(models.Model):
         on_delete=models.CASCADE,
     )
     dt = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменен")
     status = models.CharField(
         max_length=15, verbose_name="Статус", choices=STATUS_CHOICES
     )
+    total_sum = models.PositiveIntegerField(default=0, verbose_name="Сумма заказа")
+    total_quantity = models.PositiveIntegerField(
+        default=0, verbose_name="Количество товаров"
+    )
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Список заказов"
         ordering = ("-dt",)
+        indexes = [
+            # история заказов пользователя постранично по дате
+            models.Index(fields=["user", "-dt"], name="order_user_dt"),
+            # корзины ищутся на каждый запрос, индекс не растет с историей заказов
+            models.Index(
+                fields=["user"],
+                condition=models.Q(status="basket"),
+                name="order_user_basket",
+            ),
+            # поиск брошенных корзин для очистки
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(status="basket"),
+                name="order_basket_updated",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.dt}"
@@ -228,3 +288,169 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         self.total_amount = self.price * self.quantity
         super(OrderItem, self).save(*args, **kwargs)
+
+
+class ShopSalesDaily(models.Model):
+    """
+    Продажи товара магазина за день. Обновляется при оформлении
+    и отмене заказов, пересчитывается командой backfill_sales_rollups.
+    Загрузка прайса пересоздает товары, поэтому внешний id и название
+    товара хранятся в строке, а связь с ProductInfo при удалении обнуляется
+    """
+
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="sales",
+        on_delete=models.CASCADE,
+    )
+    product_info = models.ForeignKey(
+        ProductInfo,
+        verbose_name="Информация о продукте",
+        related_name="sales",
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    external_id = models.PositiveIntegerField(
+        default=0, verbose_name="Внешний ID продукта"
+    )
+    product_name = models.CharField(
+        max_length=100, verbose_name="Название продукта", blank=True
+    )
+    day = models.DateField(verbose_name="День")
+    quantity = models.IntegerField(default=0, verbose_name="Продано штук")
+    revenue = models.BigIntegerField(default=0, verbose_name="Выручка")
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shop", "product_info", "day"], name="unique_shop_sales_daily"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["shop", "day"], name="shop_sales_daily_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id} - {self.product_info_id} - {self.day}: {self.quantity}"
+
+
+class OrderChange(models.Model):
+    """
+    Журнал изменений заказов по магазинам. Курсором ленты заказов поставщика
+    служит номер транзакции xid (в SQLite - возрастающий id)
+    """
+
+    order = models.ForeignKey(
+        Order,
+        verbose_name="Заказ",
+        related_name="changes",
+        on_delete=models.CASCADE,
+    )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="order_changes",
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(
+        max_length=15, verbose_name="Статус", choices=STATUS_CHOICES
+    )
+    # номер транзакции PostgreSQL, записавшей изменение; курсор ленты
+    xid = models.BigIntegerField(verbose_name="Транзакция", null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Изменение заказа"
+        verbose_name_plural = "Журнал изменений заказов"
+        indexes = [
+            models.Index(fields=["shop", "id"], name="order_change_shop"),
+            models.Index(fields=["shop", "xid"], name="order_change_shop_xid"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.shop_id}: {self.status}"
+
+
+class PartnerWebhook(models.Model):
+    """
+    Адрес поставщика, на который отправляются пачки измененных заказов
+    его магазина. last_change_id - курсор доставленных изменений OrderChange
+    """
+
+    shop = models.OneToOneField(
+        Shop,
+        verbose_name="Магазин",
+        related_name="webhook",
+        on_delete=models.CASCADE,
+    )
+    url = models.URLField(verbose_name="Адрес")
+    secret = models.CharField(max_length=64, verbose_name="Ключ подписи")
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    last_change_id = models.PositiveBigIntegerField(
+        default=0, verbose_name="Последнее доставленное изменение"
+    )
+    failures = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Ошибок доставки подряд"
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Следующая попытка"
+    )
+    last_error = models.TextField(verbose_name="Последняя ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Webhook поставщика"
+        verbose_name_plural = "Webhooks поставщиков"
+
+    def __str__(self):
+        return f"{self.shop} - {self.url}"
+
+
+class Notification(models.Model):
+    """
+    Исходящее письмо: пишется в той же транзакции, что и изменение данных,
+    отправляется воркером Celery
+    """
+
+    email = models.EmailField(max_length=50, verbose_name="Получатель")
+    subject = models.CharField(max_length=150, verbose_name="Тема")
+    message = models.TextField(verbose_name="Текст", blank=True)
+    template = models.CharField(max_length=100, verbose_name="Шаблон", blank=True)
+    context = models.JSONField(verbose_name="Данные шаблона", default=dict, blank=True)
+    dedup_key = models.CharField(
+        max_length=100,
+        verbose_name="Ключ дедупликации",
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=10,
+        verbose_name="Статус",
+        choices=NOTIFICATION_STATUS_CHOICES,
+        default="pending",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Попыток отправки"
+    )
+    # для status="sending" - срок аренды: после него письмо снова берется в работу
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Следующая попытка"
+    )
+    last_error = models.TextField(verbose_name="Последняя ошибка", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Очередь уведомлений"
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="notification_pending"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.email} - {self.subject}"
@@ -0,0 +1,189 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from retail_purchase_service.celery import app
+from supplier.models import Notification, Order
+
+logger = logging.getLogger(__name__)
+
+SENDING_SCHEDULED_KEY = "notifications:scheduled"
+
+
+def enqueue_notifications(notifications) -> None:
+    """
+    Записываем письма в очередь в текущей транзакции.
+    Повторы с тем же dedup_key игнорируются, воркер запускается после коммита
+    """
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    transaction.on_commit(start_sending)
+
+
+def order_placed_notifications(order_id: int, email: str) -> list:
+    """
+    Письма покупателю и администратору о новом заказе
+    """
+    notifications = [
+        Notification(
+            email=email,
+            subject="Подтверждение заказа пользователю",
+            message="Plain text content for client",
+            template="email_templates/client_email_template.html",
+            context={"order_id": order_id},
+            dedup_key=f"order:{order_id}:new:client",
+        )
+    ]
+    if settings.DEFAULT_FROM_EMAIL:
+        notifications.append(
+            Notification(
+                email=settings.DEFAULT_FROM_EMAIL,
+                subject="Подтверждение заказа админу",
+                message="Plain text content for admin",
+                template="email_templates/admin_email_template.html",
+                context={"order_id": order_id},
+                dedup_key=f"order:{order_id}:new:admin",
+            )
+        )
+    return notifications
+
+
+def confirmation_notification(email: str, token_key: str) -> Notification:
+    """
+    Письмо со ссылкой подтверждения регистрации
+    """
+    confirmation_link = (
+        f"{settings.BASE_URL}/user/register/confirm?token={token_key}&email={email}"
+    )
+    return Notification(
+        email=email,
+        subject="Подтверждение регистрации",
+        message=f"Для подтверждения регистрации перейдите по ссылке: {confirmation_link}",
+        template="email_templates/confirmation_email_template.html",
+        context={"confirmation_link": confirmation_link},
+        dedup_key=f"confirm-email:{token_key}",
+    )
+
+
+def start_sending() -> None:
+    """
+    Запускаем отправку не чаще раза в NOTIFICATION_FLUSH_INTERVAL секунд,
+    чтобы письма за этот интервал ушли одной пачкой по одному соединению.
+    Если брокер недоступен, письма отправит периодическая задача
+    """
+    interval = settings.NOTIFICATION_FLUSH_INTERVAL
+    try:
+        if cache.add(SENDING_SCHEDULED_KEY, 1, timeout=interval):
+            app.send_task("supplier.tasks.send_notifications", countdown=interval)
+    except Exception as error:
+        logger.warning(f"Error starting notification sending: {error}")
+
+
+def enqueue_notification(email, subject, message="", **kwargs) -> None:
+    enqueue_notifications(
+        [Notification(email=email, subject=subject, message=message, **kwargs)]
+    )
+
+
+def get_template_context(notification) -> dict:
+    context = dict(notification.context)
+    order_id = context.pop("order_id", None)
+    if order_id is not None:
+        context["order"] = (
+            Order.objects.filter(id=order_id)
+            .select_related("user", "contact")
+            .prefetch_related("ordered_items__product_info__product")
+            .first()
+        )
+    return context
+
+
+def build_message(notification) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        notification.subject,
+        notification.message,
+        settings.DEFAULT_FROM_EMAIL,
+        [notification.email],
+    )
+    if notification.template:
+        message.attach_alternative(
+            render_to_string(notification.template, get_template_context(notification)),
+            "text/html",
+        )
+    return message
+
+
+def claim_notifications(batch_size: int) -> list:
+    """
+    Берем пачку писем в работу короткой транзакцией: строки блокируются
+    с SKIP LOCKED и помечаются status="sending" со сроком аренды.
+    Письма воркера, упавшего во время отправки, снова берутся после этого срока
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(status__in=("pending", "sending"), next_attempt_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        Notification.objects.filter(id__in=[item.id for item in batch]).update(
+            status="sending",
+            next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_LEASE),
+        )
+    return batch
+
+
+def send_pending_notifications(batch_size: int) -> int:
+    """
+    Отправляем пачку писем из очереди. SMTP работает вне транзакции,
+    взятые письма другие воркеры не получат до истечения аренды.
+    Неудачные попытки откладываются с экспоненциальной задержкой
+    """
+    batch = claim_notifications(batch_size)
+    if not batch:
+        return 0
+
+    # одно SMTP-соединение на всю пачку вместо TLS-рукопожатия на каждое письмо
+    connection = get_connection()
+    try:
+        errors = {}
+        for notification in batch:
+            try:
+                connection.open()
+                connection.send_messages([build_message(notification)])
+            except Exception as error:
+                logger.warning(f"Error sending notification {notification.id}: {error}")
+                errors[notification.id] = error
+                # соединение могло оборваться, следующее письмо откроет новое
+                connection.close()
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    for notification in batch:
+        error = errors.get(notification.id)
+        if error is not None:
+            notification.status = "pending"
+            notification.attempts += 1
+            notification.last_error = str(error)
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.status = "failed"
+            else:
+                notification.next_attempt_at = now + timedelta(
+                    seconds=settings.NOTIFICATION_RETRY_DELAY
+                    * 2 ** (notification.attempts - 1)
+                )
+        else:
+            notification.status = "sent"
+            notification.sent_at = now
+
+    Notification.objects.bulk_update(
+        batch,
+        ["status", "attempts", "last_error", "next_attempt_at", "sent_at"],
+    )
+    return len(batch)
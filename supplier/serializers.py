@@ -2,8 +2,8 @@ from rest_framework import serializers
 
 from customer.models import Contact, User
 
-from .models import (Category, Contact, Order, OrderItem, Product, ProductInfo,
-                     ProductParameter, Shop, User)
+from .models import (Category, Contact, Order, OrderItem, PartnerWebhook,
+                     Product, ProductInfo, ProductParameter, Shop, User)
 
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -53,6 +53,27 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class CategoryCountSerializer(CategorySerializer):
+    product_count = serializers.SerializerMethodField()
+    shops = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + (
+            "product_count",
+            "shops",
+        )
+
+    # счетчики берутся из предзагруженного списка active_counts
+    def get_product_count(self, obj):
+        return sum(row.count for row in obj.active_counts)
+
+    def get_shops(self, obj):
+        return [
+            {"shop": row.shop_id, "product_count": row.count}
+            for row in obj.active_counts
+        ]
+
+
 class ShopSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shop
@@ -104,8 +125,8 @@ class ProductInfoSerializer(serializers.ModelSerializer):
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
-        fields = ("id", "product_info", "quantity", "order")
-        read_only_fields = ("id",)
+        fields = ("id", "product_info", "quantity", "price", "total_amount", "order")
+        read_only_fields = ("id", "price", "total_amount")
         extra_kwargs = {"order": {"write_only": True}}
 
 
@@ -115,8 +136,6 @@ class OrderItemCreateSerializer(OrderItemSerializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
-
-    total_sum = serializers.IntegerField()
     contact = ContactSerializer(read_only=True)
 
     class Meta:
@@ -127,6 +146,21 @@ class OrderSerializer(serializers.ModelSerializer):
             "status",
             "dt",
             "total_sum",
+            "total_quantity",
             "contact",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "total_sum", "total_quantity")
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ("id", "status", "dt", "total_sum", "total_quantity")
+        read_only_fields = fields
+
+
+class PartnerWebhookSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PartnerWebhook
+        fields = ("url", "is_active", "last_change_id", "failures", "last_error")
+        read_only_fields = ("is_active", "last_change_id", "failures", "last_error")
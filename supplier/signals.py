@@ -1,9 +1,12 @@
+from datetime import timedelta
+
 from django.dispatch import Signal, receiver
+from django.utils import timezone
 from django_rest_passwordreset.signals import reset_password_token_created
 
 from customer.models import ConfirmEmailToken, User
 
-from .tasks import send_email
+from .notifications import enqueue_notification
 
 new_user_registered = Signal()
 
@@ -22,9 +25,12 @@ def password_reset_token_created(sender, instance, reset_password_token, **kwarg
     :return:
     """
     # send an e-mail to the user
-    message = f"Token {reset_password_token.key}"
-    email = reset_password_token.user
-    send_email(message, email)
+    enqueue_notification(
+        reset_password_token.user.email,
+        "Сброс пароля",
+        f"Token {reset_password_token.key}",
+        dedup_key=f"password-reset:{reset_password_token.key}",
+    )
 
 
 @receiver(new_user_registered)
@@ -34,9 +40,12 @@ def new_user_registered_signal(user_id, **kwargs):
     """
     # send an e-mail to the user
     token, _ = ConfirmEmailToken.objects.get_or_create(user_id=user_id)
-    message = token.key
-    email = token.user.email
-    send_email(message, email)
+    enqueue_notification(
+        token.user.email,
+        "Подтверждение регистрации",
+        token.key,
+        dedup_key=f"confirm-email:{token.key}",
+    )
 
 
 @receiver(new_order)
@@ -46,7 +55,9 @@ def new_order_signal(user_id, **kwargs):
     """
     # send an e-mail to the user
     user = User.objects.get(id=user_id)
-    title = "Обновление статуса заказа"
-    message = "Заказ сформирован"
-    email = user.email
-    send_email.apply_async((title, message, email), countdown=5 * 60)
+    enqueue_notification(
+        user.email,
+        "Обновление статуса заказа",
+        "Заказ сформирован",
+        next_attempt_at=timezone.now() + timedelta(minutes=5),
+    )
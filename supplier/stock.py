@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models import F, Sum
+
+from supplier.analytics import add_order_sales
+from supplier.catalog import invalidate_product_fragments
+from supplier.feed import record_order_changes
+from supplier.models import RESERVED_STATUSES, Order, OrderItem, ProductInfo
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_info_ids):
+        self.product_info_ids = product_info_ids
+        super().__init__(f"Недостаточно товара на складе: {product_info_ids}")
+
+
+def order_quantities(order_ids) -> dict:
+    """
+    Суммарное количество каждого товара в заказах: {id ProductInfo: количество}
+    """
+    return dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_info_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_info_id", "total")
+    )
+
+
+def reserve_stock(quantities: dict) -> None:
+    """
+    Списываем остатки условными UPDATE ... WHERE quantity >= n без select_for_update.
+    Строки обновляются в порядке id, чтобы параллельные заказы не взаимоблокировались.
+    Вызывается внутри transaction.atomic: при нехватке товара откатывается весь заказ
+    """
+    failed = []
+    for product_info_id in sorted(quantities):
+        quantity = quantities[product_info_id]
+        updated = ProductInfo.objects.filter(
+            id=product_info_id, quantity__gte=quantity
+        ).update(quantity=F("quantity") - quantity)
+        if not updated:
+            failed.append(product_info_id)
+
+    if failed:
+        raise InsufficientStock(failed)
+
+    transaction.on_commit(lambda: invalidate_product_fragments(quantities))
+
+
+def release_stock(quantities: dict) -> None:
+    for product_info_id in sorted(quantities):
+        ProductInfo.objects.filter(id=product_info_id).update(
+            quantity=F("quantity") + quantities[product_info_id]
+        )
+
+    transaction.on_commit(lambda: invalidate_product_fragments(quantities))
+
+
+def cancel_orders(order_ids) -> list:
+    """
+    Отменяем заказы и возвращаем их товары на склад.
+    Возвращает id отмененных заказов
+    """
+    with transaction.atomic():
+        canceled = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status__in=RESERVED_STATUSES)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if canceled:
+            Order.objects.filter(id__in=canceled).update(status="canceled")
+            record_order_changes(canceled)
+            add_order_sales(canceled, sign=-1)
+            release_stock(order_quantities(canceled))
+    return canceled
@@ -1,32 +1,35 @@
 import json
 import logging
+import time
+from datetime import timedelta
 from typing import Union
 
-from django.conf.global_settings import EMAIL_HOST_USER
-from django.core.mail.message import EmailMultiAlternatives
+from django.conf import settings
 from django.db import transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 
+from customer.onboarding import bulk_register_users
 from retail_purchase_service.celery import app
+from supplier.basket import (delete_abandoned_baskets, flush_dirty_baskets,
+                             redis_basket_enabled)
+from supplier.catalog import (bump_catalog_version, refresh_category_counts,
+                              write_catalog_snapshots)
 from supplier.models import (Category, Parameter, Product, ProductInfo,
                              ProductParameter, Shop)
+from supplier.notifications import (enqueue_notification,
+                                    send_pending_notifications)
+from supplier.webhooks import deliver_webhook, due_webhooks
 
 logger = logging.getLogger(__name__)
 
 
 @app.task()
 def send_email(message: str, email: str, *args, **kwargs) -> str:
+    # письмо уходит через очередь уведомлений пачкой по общему соединению
     title = "Title"
-    email_list = list()
-    email_list.append(email)
-    try:
-        msg = EmailMultiAlternatives(
-            subject=title, body=message, from_email=EMAIL_HOST_USER, to=email_list
-        )
-        msg.send()
-        return f"Title: {msg.subject}, Message:{msg.body}"
-    except Exception as e:
-        raise e
+    enqueue_notification(email, title, message)
+    return f"Title: {title}, Message:{message}"
 
 
 def open_file(file) -> Union[str, dict]:
@@ -151,7 +154,82 @@ def import_shop_data(file, user_id, file_name):
                     except IntegrityError as e:
                         print(f"Error inserting product {item.get('name', '')}: {e}")
 
+            # Обновим количество товаров по категориям и снимки каталога
+            refresh_category_counts(shop.id)
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(lambda: build_catalog_snapshots.delay(shop.id))
+
         return {"Status": True, "Message": "Данные успешно обновлены"}
     except Exception as e:
         logger.error(f"Error during data import: {e}")
         raise
+
+
+@app.task
+def build_catalog_snapshots(shop_id=None):
+    return write_catalog_snapshots(shop_id)
+
+
+@app.task
+def flush_redis_baskets():
+    if not redis_basket_enabled():
+        return 0
+    return flush_dirty_baskets(settings.BASKET_FLUSH_BATCH_SIZE)
+
+
+@app.task
+def cleanup_abandoned_baskets():
+    started = time.monotonic()
+    before = timezone.now() - timedelta(days=settings.BASKET_ABANDONED_DAYS)
+    orders, items = delete_abandoned_baskets(before, settings.BASKET_CLEANUP_BATCH_SIZE)
+    elapsed = round(time.monotonic() - started, 3)
+    logger.info(
+        f"Abandoned baskets removed: {orders} orders, {items} items in {elapsed}s"
+    )
+    return {"orders": orders, "items": items, "elapsed": elapsed}
+
+
+@app.task
+def send_notifications():
+    started = time.monotonic()
+    sent = 0
+    while True:
+        batch = send_pending_notifications(settings.NOTIFICATION_BATCH_SIZE)
+        sent += batch
+        if batch < settings.NOTIFICATION_BATCH_SIZE:
+            break
+
+    # пропускная способность отправки для сравнения с отправкой по одному письму
+    elapsed = time.monotonic() - started
+    if sent:
+        logger.info(
+            f"Notifications processed: {sent} in {round(elapsed, 3)}s "
+            f"({round(sent / elapsed, 1) if elapsed else sent} msgs/sec)"
+        )
+    return sent
+
+
+@app.task
+def deliver_webhooks():
+    webhook_ids = list(due_webhooks().values_list("id", flat=True))
+    for webhook_id in webhook_ids:
+        deliver_partner_webhook.delay(webhook_id)
+    return len(webhook_ids)
+
+
+@app.task
+def deliver_partner_webhook(webhook_id: int):
+    delivered = deliver_webhook(webhook_id)
+    # полная пачка - вероятно, есть еще изменения, отправляем следующую сразу
+    if delivered == settings.ORDER_FEED_LIMIT:
+        deliver_partner_webhook.delay(webhook_id)
+    return delivered
+
+
+@app.task
+def register_users_chunk(rows: list):
+    # задачи части списка выполняются параллельно воркерами Celery,
+    # поэтому внутри задачи пароли хешируются без своего пула
+    return bulk_register_users(
+        rows, workers=1, batch_size=settings.ONBOARDING_BATCH_SIZE
+    )
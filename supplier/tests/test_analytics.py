@@ -0,0 +1,95 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from supplier.models import OrderItem, Product, ShopSalesDaily, User
+from supplier.stock import cancel_orders
+from supplier.tests.test_stock import (checkout, create_basket,
+                                       create_product_info)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.product_info = create_product_info(quantity=10)
+        self.partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        self.product_info.shop.user = self.partner
+        self.product_info.shop.save()
+
+    def place_order(self, email, quantity):
+        user, basket = create_basket(email, self.product_info, quantity)
+        OrderItem.objects.filter(order=basket).update(
+            price=1000, total_amount=1000 * quantity
+        )
+        response = checkout(user, basket)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return basket
+
+    def test_rollups_follow_checkout_and_cancel(self):
+        self.place_order("buyer1@example.com", 2)
+        order = self.place_order("buyer2@example.com", 3)
+
+        sales = ShopSalesDaily.objects.get(product_info=self.product_info)
+        self.assertEqual((sales.quantity, sales.revenue), (5, 5000))
+
+        cancel_orders([order.id])
+        sales.refresh_from_db()
+        self.assertEqual((sales.quantity, sales.revenue), (2, 2000))
+
+        ShopSalesDaily.objects.all().delete()
+        call_command("backfill_sales_rollups", stdout=None)
+        sales = ShopSalesDaily.objects.get(product_info=self.product_info)
+        self.assertEqual((sales.quantity, sales.revenue), (2, 2000))
+
+    def test_partner_report(self):
+        self.place_order("buyer1@example.com", 2)
+
+        client = APIClient()
+        client.force_authenticate(self.partner)
+        response = client.get(reverse("partner-analytics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data["total"], {"quantity": 2, "revenue": 2000})
+        self.assertEqual(data["previous"]["revenue_change"], None)
+        self.assertEqual(
+            data["daily"],
+            [
+                {
+                    "day": timezone.now().date().isoformat(),
+                    "quantity": 2,
+                    "revenue": 2000,
+                }
+            ],
+        )
+        self.assertEqual(data["top_products"][0]["product_info"], self.product_info.id)
+
+    def test_history_survives_catalog_reimport(self):
+        self.place_order("buyer1@example.com", 2)
+        Product.objects.filter(id=self.product_info.product_id).delete()
+
+        sales = ShopSalesDaily.objects.get()
+        self.assertIsNone(sales.product_info_id)
+        self.assertEqual((sales.external_id, sales.product_name), (1, "Смартфон"))
+
+        call_command("backfill_sales_rollups", stdout=None)
+        self.assertEqual(ShopSalesDaily.objects.get().quantity, 2)
+
+        client = APIClient()
+        client.force_authenticate(self.partner)
+        data = client.get(reverse("partner-analytics")).json()
+        self.assertEqual(data["total"], {"quantity": 2, "revenue": 2000})
+        self.assertEqual(data["top_products"][0]["name"], "Смартфон")
+
+    def test_dates_near_calendar_start_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.partner)
+        response = client.get(reverse("partner-analytics"), {"date_from": "0001-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,78 @@
+import csv
+import io
+from datetime import timedelta
+from unittest import skipIf, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from supplier.archive import (ArchiveNotSupported, archive_month,
+                              archive_table_name)
+from supplier.models import Order, OrderItem, Shop, User
+from supplier.tests.test_stock import create_basket, create_product_info
+
+
+@skipUnless(connection.vendor == "postgresql", "архив использует PostgreSQL")
+class OrderArchiveTests(TestCase):
+    def test_old_finished_orders_are_archived(self):
+        product_info = create_product_info(quantity=5)
+        _, old_order = create_basket("old@example.com", product_info, 1)
+        _, recent_order = create_basket("recent@example.com", product_info, 1)
+        old_dt = timezone.now() - timedelta(days=400)
+        Order.objects.filter(id=old_order.id).update(status="delivered", dt=old_dt)
+        Order.objects.filter(id=recent_order.id).update(status="delivered")
+
+        call_command("archive_orders", stdout=None)
+
+        self.assertFalse(Order.objects.filter(id=old_order.id).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=old_order.id).exists())
+        self.assertTrue(Order.objects.filter(id=recent_order.id).exists())
+
+        table = archive_table_name(OrderItem, old_dt)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {connection.ops.quote_name(table)} "
+                f"WHERE order_id = %s",
+                [old_order.id],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_archived_orders_are_not_returned_by_api(self):
+        product_info = create_product_info(quantity=5)
+        buyer, order = create_basket("old@example.com", product_info, 1)
+        Order.objects.filter(id=order.id).update(
+            status="delivered", dt=timezone.now() - timedelta(days=400)
+        )
+        partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        Shop.objects.filter(id=product_info.shop_id).update(user=partner)
+
+        call_command("archive_orders", stdout=None)
+
+        client = APIClient()
+        client.force_authenticate(buyer)
+        self.assertEqual(client.get(reverse("order")).json()["results"], [])
+
+        client.force_authenticate(partner)
+        self.assertEqual(client.get(reverse("partner-orders")).json(), [])
+        response = client.get(reverse("partner-order-export"), {"file_format": "csv"})
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(list(csv.DictReader(io.StringIO(content))), [])
+
+
+@skipIf(connection.vendor == "postgresql", "проверяется отказ в других БД")
+class OrderArchiveUnsupportedTests(TestCase):
+    def test_archive_requires_postgresql(self):
+        with self.assertRaises(ArchiveNotSupported):
+            archive_month(timezone.now().date(), timezone.now(), batch_size=10)
+
+        with self.assertRaises(CommandError):
+            call_command("archive_orders", stdout=None)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from customer.authentication import CachedTokenAuthentication, local_tokens
+from customer.hashing import (HashingBusy, PasswordHasherPool, hash_password,
+                              hasher_pool, verify_password)
+from customer.models import User
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123", is_active=True
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_token_is_checked_in_db_once(self):
+        authentication = CachedTokenAuthentication()
+        with self.assertNumQueries(1):
+            authentication.authenticate_credentials(self.token.key)
+
+        local_tokens.clear()
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.id, self.user.id)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(
+            self.client.get(reverse("user-details")).status_code, status.HTTP_200_OK
+        )
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse("user-details"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_logout_revokes_token(self):
+        self.assertEqual(
+            self.client.get(reverse("user-details")).status_code, status.HTTP_200_OK
+        )
+
+        response = self.client.post(reverse("user-logout"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse("user-details"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PasswordHashingPoolTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123", is_active=True
+        )
+
+    def login(self, password):
+        return APIClient().post(
+            reverse("user-login"),
+            {"email": "buyer@example.com", "password": password},
+            format="json",
+        )
+
+    def test_login_checks_password_in_pool(self):
+        self.assertEqual(
+            self.login("StrongPassword123").status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            self.login("WrongPassword").status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_full_queue_returns_503(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch.object(hasher_pool, "slots", slots), mock.patch.object(
+            hasher_pool, "wait", 0
+        ):
+            response = self.login("StrongPassword123")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_inactive_user_costs_one_hash(self):
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        with mock.patch(
+            "supplier.views.hash_password", wraps=hash_password
+        ) as dummy_hash:
+            response = self.login("StrongPassword123")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        dummy_hash.assert_called_once_with("StrongPassword123")
+
+    def test_broken_pool_is_recreated(self):
+        pool = PasswordHasherPool(workers=1, queue_size=2, wait=1, timeout=30)
+        self.addCleanup(lambda: pool.executor and pool.executor.shutdown())
+        broken = pool.get_executor()
+        broken.submit(os._exit, 1).exception()
+
+        self.assertTrue(pool.run(verify_password, "secret", make_password("secret")))
+        self.assertIsNot(pool.executor, broken)
+
+    def test_slow_hashing_returns_503(self):
+        pool = PasswordHasherPool(workers=1, queue_size=2, wait=1, timeout=0.01)
+        self.addCleanup(lambda: pool.executor.shutdown())
+        with self.assertRaises(HashingBusy):
+            pool.run(time.sleep, 1)
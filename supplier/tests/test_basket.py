@@ -0,0 +1,173 @@
+from unittest import mock
+
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from supplier.basket import DIRTY_BASKETS_KEY, RedisBasket, flush_dirty_baskets
+from supplier.models import (Category, Order, OrderItem, Product, ProductInfo,
+                             Shop)
+
+User = get_user_model()
+
+
+def create_product_infos(count):
+    shop = Shop.objects.create(name="DNS-shop")
+    category = Category.objects.create(name="Смартфоны")
+    product_infos = []
+    for external_id in range(1, count + 1):
+        product = Product.objects.create(
+            external_id=external_id,
+            name=f"Смартфон {external_id}",
+            category=category,
+            shop=shop,
+        )
+        product_infos.append(
+            ProductInfo.objects.create(
+                model=f"model-{external_id}",
+                quantity=10,
+                price=1000,
+                price_rrc=1200,
+                product=product,
+                shop=shop,
+            )
+        )
+    return product_infos
+
+
+@override_settings(BASKET_STORE="redis")
+class RedisBasketTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch("supplier.basket.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            email="buyer@example.com", username="buyer", password="StrongPassword123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product_infos = create_product_infos(3)
+        self.basket = RedisBasket(self.user.id)
+
+    def saved_quantities(self):
+        return dict(
+            OrderItem.objects.filter(
+                order__user=self.user, order__status="basket"
+            ).values_list("product_info_id", "quantity")
+        )
+
+    def test_get_empty_basket_does_not_write(self):
+        response = self.client.get(reverse("basket"))
+
+        self.assertEqual(response.json(), [])
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+    def test_get_reuses_saved_basket(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+
+        first = self.client.get(reverse("basket")).json()
+        second = self.client.get(reverse("basket")).json()
+
+        self.assertEqual(first[0]["id"], second[0]["id"])
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(second[0]["total_sum"], 2000)
+
+    def test_flush_error_keeps_dirty_mark(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+
+        with mock.patch.object(
+            RedisBasket, "materialize", side_effect=RuntimeError("db down")
+        ):
+            self.assertEqual(flush_dirty_baskets(10), 0)
+        self.assertTrue(self.redis.sismember(DIRTY_BASKETS_KEY, self.user.id))
+
+        self.assertEqual(flush_dirty_baskets(10), 1)
+        self.assertFalse(self.redis.sismember(DIRTY_BASKETS_KEY, self.user.id))
+        self.assertEqual(self.saved_quantities(), {self.product_infos[0].id: 2})
+
+    def test_change_during_flush_keeps_dirty_mark(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+        materialize = RedisBasket.materialize
+
+        def materialize_with_put(basket, items=None):
+            result = materialize(basket, items)
+            RedisBasket(self.user.id).set_items({self.product_infos[1]: 1})
+            return result
+
+        with mock.patch.object(RedisBasket, "materialize", materialize_with_put):
+            self.assertEqual(flush_dirty_baskets(10), 0)
+
+        self.assertTrue(self.redis.sismember(DIRTY_BASKETS_KEY, self.user.id))
+        flush_dirty_baskets(10)
+        self.assertEqual(
+            self.saved_quantities(),
+            {self.product_infos[0].id: 2, self.product_infos[1].id: 1},
+        )
+
+    def test_expired_basket_keeps_saved_items(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+        flush_dirty_baskets(10)
+
+        # hash истек, а отметка об изменении осталась
+        self.redis.delete(self.basket.key)
+        self.redis.sadd(DIRTY_BASKETS_KEY, self.user.id)
+        flush_dirty_baskets(10)
+        self.basket.materialize()
+
+        self.assertEqual(self.saved_quantities(), {self.product_infos[0].id: 2})
+        self.assertEqual(self.basket.items(), {self.product_infos[0].id: 2})
+        self.assertTrue(self.redis.exists(self.basket.key))
+
+    def test_removing_last_item_clears_saved_basket(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+        flush_dirty_baskets(10)
+
+        self.basket.remove_items([self.product_infos[0].id])
+
+        self.assertEqual(self.saved_quantities(), {})
+        self.assertEqual(self.basket.items(), {})
+        self.assertEqual(
+            Order.objects.get(user=self.user, status="basket").total_quantity, 0
+        )
+
+    def test_put_during_checkout_is_kept(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+        basket_id = self.basket.materialize().id
+        materialize = RedisBasket.materialize
+
+        def materialize_with_put(basket, items=None):
+            result = materialize(basket, items)
+            RedisBasket(self.user.id).set_items({self.product_infos[1]: 1})
+            return result
+
+        with mock.patch.object(RedisBasket, "materialize", materialize_with_put):
+            response = self.client.post(
+                reverse("order"), {"id": basket_id}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(
+                OrderItem.objects.filter(order_id=basket_id).values_list(
+                    "product_info_id", flat=True
+                )
+            ),
+            [self.product_infos[0].id],
+        )
+        self.assertEqual(self.basket.items(), {self.product_infos[1].id: 1})
+        self.assertTrue(self.redis.sismember(DIRTY_BASKETS_KEY, self.user.id))
+
+    def test_checkout_clears_ordered_items(self):
+        self.basket.set_items({self.product_infos[0]: 2})
+        basket_id = self.basket.materialize().id
+
+        response = self.client.post(reverse("order"), {"id": basket_id}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(self.redis.exists(self.basket.key))
+        self.assertFalse(self.redis.sismember(DIRTY_BASKETS_KEY, self.user.id))
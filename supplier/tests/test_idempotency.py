@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from supplier.idempotency import REPLAYED_HEADER, idempotency_cache_key
+from supplier.tests.test_stock import create_basket, create_product_info
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    IDEMPOTENCY_WAIT=0,
+)
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product_info = create_product_info(quantity=5)
+        self.user, self.basket = create_basket(
+            "buyer@example.com", self.product_info, 2
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, key, order_id=None):
+        return self.client.post(
+            reverse("order"),
+            {"id": order_id or self.basket.id},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_first_response(self):
+        first = self.checkout("checkout-1")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        retry = self.checkout("checkout-1")
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry[REPLAYED_HEADER], "true")
+        self.assertEqual(retry.content, first.content)
+
+        self.product_info.refresh_from_db()
+        self.assertEqual(self.product_info.quantity, 3)
+
+    def test_key_reuse_with_other_body_is_rejected(self):
+        self.checkout("checkout-1")
+        response = self.checkout("checkout-1", order_id=self.basket.id + 1)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_in_flight_duplicate_is_not_executed(self):
+        request = APIRequestFactory().post(reverse("order"))
+        request.user = self.user
+        request.method = "POST"
+        cache.add(f"{idempotency_cache_key(request, 'checkout-1')}:lock", 1)
+
+        response = self.checkout("checkout-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        self.basket.refresh_from_db()
+        self.assertEqual(self.basket.status, "basket")
+
+    def test_expired_lock_of_another_request_is_kept(self):
+        request = APIRequestFactory().post(reverse("order"))
+        request.user = self.user
+        lock_key = f"{idempotency_cache_key(request, 'checkout-1')}:lock"
+        reserve_stock = "supplier.views.reserve_stock"
+
+        def slow_reserve(quantities):
+            # запрос затянулся, блокировка истекла и досталась дублю
+            cache.set(lock_key, "other-request")
+
+        with mock.patch(reserve_stock, side_effect=slow_reserve):
+            response = self.checkout("checkout-1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cache.get(lock_key), "other-request")
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import get_connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from supplier.models import Notification, Order
+from supplier.notifications import (enqueue_notification,
+                                    send_pending_notifications)
+from supplier.tasks import send_notifications
+
+User = get_user_model()
+
+
+class NotificationOutboxTests(TestCase):
+    def test_checkout_does_not_wait_for_smtp(self):
+        user = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        basket = Order.objects.create(user=user, status="basket")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post(reverse("order"), {"id": basket.id}, format="json")
+        self.assertTrue(response.json()["Status"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(
+            Notification.objects.filter(
+                email=user.email, dedup_key=f"order:{basket.id}:new:client"
+            ).exists()
+        )
+
+        send_pending_notifications(batch_size=10)
+        self.assertEqual(mail.outbox[0].to, [user.email])
+        self.assertIn(f"Номер заказа: {basket.id}", mail.outbox[0].alternatives[0][0])
+
+    def test_duplicate_notifications_are_ignored(self):
+        for _ in range(2):
+            enqueue_notification("buyer@example.com", "Тема", dedup_key="same")
+
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_failed_send_is_retried_later(self):
+        enqueue_notification("buyer@example.com", "Тема")
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("SMTP недоступен"),
+        ):
+            send_pending_notifications(batch_size=10)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, notification.created_at)
+
+        # до следующей попытки письмо не отправляется
+        self.assertEqual(send_pending_notifications(batch_size=10), 0)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for number in range(5):
+            enqueue_notification(f"buyer{number}@example.com", "Тема")
+
+        with mock.patch(
+            "supplier.notifications.get_connection", wraps=get_connection
+        ) as connection_factory:
+            self.assertEqual(send_pending_notifications(batch_size=10), 5)
+
+        connection_factory.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(Notification.objects.filter(status="sent").count(), 5)
+
+    def test_batch_is_claimed_before_sending(self):
+        enqueue_notification("buyer@example.com", "Тема")
+        statuses = []
+
+        def send_messages(messages):
+            statuses.append(Notification.objects.get().status)
+            return len(messages)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=send_messages,
+        ):
+            send_pending_notifications(batch_size=10)
+
+        self.assertEqual(statuses, ["sending"])
+        self.assertEqual(Notification.objects.get().status, "sent")
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue_notification("buyer@example.com", "Тема")
+        enqueue_notification("buyer2@example.com", "Тема")
+        Notification.objects.filter(email="buyer@example.com").update(
+            status="sending", next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        Notification.objects.filter(email="buyer2@example.com").update(
+            status="sending", next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(send_pending_notifications(batch_size=10), 1)
+        self.assertEqual(mail.outbox[0].to, ["buyer@example.com"])
+
+    def test_send_task_logs_throughput(self):
+        for number in range(3):
+            enqueue_notification(f"buyer{number}@example.com", "Тема")
+
+        with self.assertLogs("supplier.tasks", level="INFO") as logs:
+            self.assertEqual(send_notifications(), 3)
+
+        self.assertIn("Notifications processed: 3", logs.output[0])
+        self.assertIn("msgs/sec", logs.output[0])
@@ -0,0 +1,73 @@
+import csv
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from customer.models import ConfirmEmailToken, User
+from supplier.models import Notification
+
+
+def onboarding_rows(count):
+    return [
+        {
+            "email": f"buyer{number}@example.com",
+            "password": "StrongPassword123",
+            "username": f"buyer{number}",
+            "first_name": "Иван",
+            "last_name": "Иванов",
+            "company": "Сеть",
+            "position": "Закупщик",
+        }
+        for number in range(count)
+    ]
+
+
+class BulkOnboardingTests(TestCase):
+    def test_command_registers_users_from_csv(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=onboarding_rows(1)[0])
+            writer.writeheader()
+            writer.writerows(onboarding_rows(5))
+            file.flush()
+
+            call_command("onboard_users", file.name, "--workers=2", stdout=None)
+
+        users = User.objects.filter(email__startswith="buyer")
+        self.assertEqual(users.count(), 5)
+        self.assertFalse(users.filter(is_active=True).exists())
+        self.assertTrue(users.first().check_password("StrongPassword123"))
+        self.assertEqual(ConfirmEmailToken.objects.count(), 5)
+        self.assertEqual(
+            Notification.objects.filter(subject="Подтверждение регистрации").count(),
+            5,
+        )
+
+    @override_settings(ONBOARDING_CHUNK_SIZE=2)
+    def test_endpoint_is_staff_only_and_validates(self):
+        client = APIClient()
+        user = User.objects.create_user(
+            email="manager@example.com", username="manager", password="Pass12345!"
+        )
+        client.force_authenticate(user)
+        url = reverse("user-bulk-register")
+
+        response = client.post(url, {"users": onboarding_rows(3)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(id=user.id).update(is_staff=True)
+        user.refresh_from_db()
+        client.force_authenticate(user)
+        rows = onboarding_rows(3) + [dict(onboarding_rows(1)[0], password="1")]
+        response = client.post(url, {"users": rows}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["line"] for error in response.json()["Errors"]], [4, 4])
+
+        with mock.patch("supplier.views.register_users_chunk.delay") as delay:
+            response = client.post(url, {"users": onboarding_rows(3)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(delay.call_count, 2)
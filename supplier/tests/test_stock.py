@@ -0,0 +1,290 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from customer.models import Contact
+from supplier.models import (Category, Notification, Order, OrderItem, Product,
+                             ProductInfo, Shop)
+from supplier.stock import cancel_orders
+
+User = get_user_model()
+
+
+def create_product_info(quantity):
+    shop = Shop.objects.create(name="DNS-shop")
+    category = Category.objects.create(name="Смартфоны")
+    product = Product.objects.create(
+        external_id=1, name="Смартфон", category=category, shop=shop
+    )
+    return ProductInfo.objects.create(
+        model="model",
+        quantity=quantity,
+        price=1000,
+        price_rrc=1200,
+        product=product,
+        shop=shop,
+    )
+
+
+def create_basket(email, product_info, quantity):
+    user = User.objects.create_user(
+        email=email, username=email, password="StrongPassword123"
+    )
+    basket = Order.objects.create(user=user, status="basket")
+    OrderItem.objects.create(order=basket, product_info=product_info, quantity=quantity)
+    return user, basket
+
+
+def checkout(user, basket):
+    client = APIClient()
+    client.force_authenticate(user)
+    try:
+        return client.post(reverse("order"), {"id": basket.id}, format="json")
+    finally:
+        connection.close()
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product_info = create_product_info(quantity=5)
+
+    def test_checkout_reserves_stock(self):
+        user, basket = create_basket("buyer@example.com", self.product_info, 3)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse("order"), {"id": basket.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.product_info.refresh_from_db()
+        self.assertEqual(self.product_info.quantity, 2)
+
+    def test_checkout_rejected_without_stock(self):
+        user, basket = create_basket("buyer@example.com", self.product_info, 6)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse("order"), {"id": basket.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()["product_info"], [self.product_info.id])
+
+        basket.refresh_from_db()
+        self.product_info.refresh_from_db()
+        self.assertEqual(basket.status, "basket")
+        self.assertEqual(self.product_info.quantity, 5)
+
+    def test_cancel_releases_stock(self):
+        _, order = create_basket("buyer@example.com", self.product_info, 2)
+        Order.objects.filter(id=order.id).update(status="new")
+        ProductInfo.objects.filter(id=self.product_info.id).update(quantity=3)
+
+        self.assertEqual(cancel_orders([order.id]), [order.id])
+        self.assertEqual(cancel_orders([order.id]), [])
+
+        self.product_info.refresh_from_db()
+        self.assertEqual(self.product_info.quantity, 5)
+
+
+@skipUnless(connection.vendor == "postgresql", "нужны параллельные транзакции")
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StockReservationConcurrencyTests(TransactionTestCase):
+    checkouts = 40
+    stock = 10
+
+    @mock.patch("supplier.notifications.start_sending")
+    def test_parallel_checkouts_do_not_oversell(self, start_sending):
+        product_info = create_product_info(quantity=self.stock)
+        baskets = [
+            create_basket(f"buyer{number}@example.com", product_info, 1)
+            for number in range(self.checkouts)
+        ]
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            responses = list(executor.map(lambda args: checkout(*args), baskets))
+
+        placed = [r for r in responses if r.status_code == status.HTTP_200_OK]
+        rejected = [r for r in responses if r.status_code == status.HTTP_409_CONFLICT]
+        self.assertEqual(len(placed), self.stock)
+        self.assertEqual(len(rejected), self.checkouts - self.stock)
+
+        product_info.refresh_from_db()
+        self.assertEqual(product_info.quantity, 0)
+        self.assertEqual(Order.objects.filter(status="new").count(), self.stock)
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.product_info = create_product_info(quantity=5)
+        self.partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        Shop.objects.filter(id=self.product_info.shop_id).update(user=self.partner)
+        _, self.order = create_basket("buyer@example.com", self.product_info, 2)
+        Order.objects.filter(id=self.order.id).update(status="new")
+        self.client = APIClient()
+        self.client.force_authenticate(self.partner)
+
+    def change_status(self, ids, new_status):
+        return self.client.post(
+            reverse("partner-order-status"),
+            {"ids": ids, "status": new_status},
+            format="json",
+        )
+
+    def test_valid_transition_is_applied(self):
+        other_order = Order.objects.create(user=self.order.user, status="new")
+
+        response = self.change_status([self.order.id, other_order.id], "confirmed")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["updated"], [self.order.id])
+        self.assertEqual(
+            response.json()["errors"],
+            [{"id": other_order.id, "Error": "Заказ не найден"}],
+        )
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "confirmed")
+        self.assertTrue(
+            Notification.objects.filter(
+                dedup_key=f"order:{self.order.id}:confirmed:client"
+            ).exists()
+        )
+
+    def test_invalid_transition_is_rejected(self):
+        response = self.change_status([self.order.id], "delivered")
+        self.assertEqual(response.json()["updated"], [])
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "new")
+
+    def test_cancel_releases_stock(self):
+        response = self.change_status([self.order.id], "canceled")
+        self.assertEqual(response.json()["updated"], [self.order.id])
+
+        self.product_info.refresh_from_db()
+        self.assertEqual(self.product_info.quantity, 7)
+
+    def test_order_with_other_shop_items_is_not_changed(self):
+        other_shop = Shop.objects.create(name="Other-shop")
+        other_product_info = ProductInfo.objects.create(
+            model="other",
+            quantity=5,
+            price=500,
+            price_rrc=600,
+            product=self.product_info.product,
+            shop=other_shop,
+        )
+        OrderItem.objects.create(
+            order=self.order, product_info=other_product_info, quantity=3
+        )
+
+        for new_status in ("confirmed", "canceled"):
+            response = self.change_status([self.order.id], new_status)
+            self.assertEqual(response.json()["updated"], [])
+            self.assertEqual(
+                response.json()["errors"],
+                [
+                    {
+                        "id": self.order.id,
+                        "Error": "Заказ содержит товары других магазинов",
+                    }
+                ],
+            )
+
+        self.order.refresh_from_db()
+        other_product_info.refresh_from_db()
+        self.assertEqual(self.order.status, "new")
+        self.assertEqual(other_product_info.quantity, 5)
+
+
+class BulkOrderTests(TestCase):
+    def setUp(self):
+        self.product_info = create_product_info(quantity=5)
+        self.user = User.objects.create_user(
+            email="chain@example.com", username="chain", password="StrongPassword123"
+        )
+        self.contacts = [
+            Contact.objects.create(
+                user=self.user, city="Москва", street=f"Улица {number}", phone="1"
+            )
+            for number in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, quantities):
+        return self.client.post(
+            reverse("order-bulk"),
+            {
+                "orders": [
+                    {
+                        "contact": contact.id,
+                        "items": [
+                            {"id": self.product_info.product_id, "quantity": quantity}
+                        ],
+                    }
+                    for contact, quantity in zip(self.contacts, quantities)
+                ]
+            },
+            format="json",
+        )
+
+    def test_orders_are_placed_in_one_request(self):
+        response = self.place([2, 3])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        orders = Order.objects.filter(id__in=response.json()["ids"]).order_by("id")
+        self.assertEqual(
+            [(order.status, order.total_quantity, order.total_sum) for order in orders],
+            [("new", 2, 2000), ("new", 3, 3000)],
+        )
+        self.product_info.refresh_from_db()
+        self.assertEqual(self.product_info.quantity, 0)
+
+    def test_insufficient_stock_rejects_all_orders(self):
+        response = self.place([3, 3])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_lines_are_reported(self):
+        response = self.client.post(
+            reverse("order-bulk"),
+            {"orders": [{"contact": 999, "items": [{"id": 999, "quantity": 1}]}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.json()["Errors"]), 2)
+
+    def test_malformed_orders_are_reported_by_index(self):
+        response = self.client.post(
+            reverse("order-bulk"),
+            {
+                "orders": [
+                    {"items": [{"id": 1, "quantity": 1}]},
+                    {"items": 5},
+                    "order",
+                    {"items": [{"id": 1, "quantity": 1}, 7]},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["Errors"],
+            [
+                {"order": 2, "Error": "Неверный формат данных"},
+                {"order": 3, "Error": "Неверный формат данных"},
+                {"order": 4, "line": 2, "Error": "Неверный формат данных"},
+            ],
+        )
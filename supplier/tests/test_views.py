@@ -1,10 +1,35 @@
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from openpyxl import load_workbook
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from customer.models import ConfirmEmailToken
+from supplier.catalog import bump_catalog_version, write_catalog_snapshots
+from supplier.feed import get_order_feed, record_order_changes
+from supplier.models import (Category, Order, OrderChange, OrderItem,
+                             Parameter, Product, ProductInfo, ProductParameter,
+                             Shop)
+from supplier.tasks import cleanup_abandoned_baskets, import_shop_data
 
 User = get_user_model()
 
@@ -114,3 +139,606 @@ class ConfirmAccountTests(TestCase):
             response.json(),
             {"Status": False, "Errors": "Не указан email или токен"},
         )
+
+
+def create_catalog(products_count=3):
+    shop = Shop.objects.create(name="DNS-shop")
+    category = Category.objects.create(name="Смартфоны")
+    parameter = Parameter.objects.create(name="Цвет")
+    product_infos = []
+    for external_id in range(1, products_count + 1):
+        product = Product.objects.create(
+            external_id=external_id,
+            name=f"Смартфон {external_id}",
+            category=category,
+            shop=shop,
+        )
+        product_info = ProductInfo.objects.create(
+            model=f"model-{external_id}",
+            quantity=10,
+            price=1000,
+            price_rrc=1200,
+            product=product,
+            shop=shop,
+        )
+        ProductParameter.objects.create(
+            product_info=product_info, parameter=parameter, value="черный"
+        )
+        product_infos.append(product_info)
+    return shop, category, product_infos
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.batch_url = reverse("products-batch")
+        _, _, self.product_infos = create_catalog()
+
+    def test_batch_keeps_request_order(self):
+        ids = [self.product_infos[2].id, self.product_infos[0].id]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.batch_url, {"ids": ",".join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.json()["results"]], ids)
+        self.assertEqual(response.json()["not_found"], [])
+
+    def test_batch_post_reports_missing_ids(self):
+        ids = [self.product_infos[1].id, 999999]
+
+        response = self.client.post(self.batch_url, {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(response.json()["not_found"], [999999])
+
+    def test_batch_deduplicates_ids(self):
+        product_id = self.product_infos[0].id
+
+        response = self.client.post(
+            self.batch_url, {"ids": [product_id, product_id]}, format="json"
+        )
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]], [product_id]
+        )
+
+    @override_settings(PRODUCT_BATCH_MAX_IDS=2)
+    def test_batch_limit(self):
+        ids = ",".join(str(item.id) for item in self.product_infos)
+
+        response = self.client.get(self.batch_url, {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.export_url = reverse("products-export")
+        self.shop, self.category, self.product_infos = create_catalog()
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.export_url, {"shop_id": self.shop.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(self.product_infos))
+        self.assertEqual(json.loads(lines[0])["parameters"], {"Цвет": "черный"})
+
+    def test_export_csv_gzip(self):
+        response = self.client.get(
+            self.export_url,
+            {"category_id": self.category.id, "file_format": "csv", "gzip": "true"},
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(
+            [int(row["id"]) for row in rows], [item.id for item in self.product_infos]
+        )
+
+    def test_export_requires_shop_or_category(self):
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CategoryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.categories_url = reverse("category-list")
+        self.user = User.objects.create_user(
+            email="shop@example.com", password="StrongPassword123", type="shop"
+        )
+        with open(settings.BASE_DIR / "supplier/data/dns.json", "rb") as file:
+            import_shop_data(file, self.user.id, "dns.json")
+
+    def test_categories_with_counts(self):
+        shop = Shop.objects.get(user=self.user)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.categories_url, {"with_counts": "true"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for category in response.json()["results"]:
+            expected = ProductInfo.objects.filter(
+                shop=shop, product__category_id=category["id"]
+            ).count()
+            self.assertEqual(category["product_count"], expected)
+            if expected:
+                self.assertEqual(
+                    category["shops"], [{"shop": shop.id, "product_count": expected}]
+                )
+
+    def test_categories_without_counts(self):
+        response = self.client.get(self.categories_url)
+        self.assertNotIn("product_count", response.json()["results"][0])
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root)
+        self.shop, self.category, self.product_infos = create_catalog()
+
+    def test_snapshot_served_precompressed(self):
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.snapshot_root):
+            write_catalog_snapshots()
+            url = reverse("catalog-snapshot", args=[f"shop-{self.shop.id}", 1])
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("public", response["Cache-Control"])
+            content = gzip.decompress(b"".join(response.streaming_content))
+            self.assertEqual(json.loads(content)["count"], len(self.product_infos))
+
+            response = self.client.get(
+                url,
+                HTTP_ACCEPT_ENCODING="gzip",
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_rejected_encoding_not_served(self):
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.snapshot_root):
+            write_catalog_snapshots()
+            url = reverse("catalog-snapshot", args=["all", 1])
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="x-gzip-like")
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="deflate, GZIP;q=0.5")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_shop_rebuild_keeps_other_scopes(self):
+        other_shop = Shop.objects.create(name="Other-shop")
+        other_category = Category.objects.create(name="Ноутбуки")
+        product = Product.objects.create(
+            external_id=100, name="Ноутбук", category=other_category, shop=other_shop
+        )
+        ProductInfo.objects.create(
+            model="laptop",
+            quantity=1,
+            price=1,
+            price_rrc=1,
+            product=product,
+            shop=other_shop,
+        )
+
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.snapshot_root):
+            root = Path(self.snapshot_root)
+            first = write_catalog_snapshots()
+            self.shop.state = False
+            self.shop.save()
+            second = write_catalog_snapshots(self.shop.id)
+
+            other_scope = f"shop-{other_shop.id}/1.json"
+            self.assertEqual(
+                (root / first / other_scope).stat().st_ino,
+                (root / second / other_scope).stat().st_ino,
+            )
+            self.assertFalse((root / second / f"shop-{self.shop.id}").exists())
+            self.assertTrue((root / first / f"shop-{self.shop.id}").exists())
+            category_page = root / second / f"category-{self.category.id}/1.json"
+            self.assertEqual(json.loads(category_page.read_bytes())["count"], 0)
+            all_page = root / second / "all/1.json"
+            self.assertEqual(json.loads(all_page.read_bytes())["count"], 1)
+
+    def test_missing_snapshot_page(self):
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.snapshot_root):
+            write_catalog_snapshots()
+            response = self.client.get(reverse("catalog-snapshot", args=["all", 5]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PartnerStateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="shop@example.com", password="StrongPassword123", type="shop"
+        )
+        self.shop = Shop.objects.create(name="DNS-shop", user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_state_saved_when_broker_unavailable(self):
+        with mock.patch(
+            "supplier.views.build_catalog_snapshots.delay",
+            side_effect=OperationalError("broker down"),
+        ):
+            response = self.client.post(
+                reverse("partner-state"), {"state": "off"}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.state)
+
+    def test_invalid_state(self):
+        with mock.patch("supplier.views.build_catalog_snapshots.delay") as delay:
+            response = self.client.post(
+                reverse("partner-state"), {"state": "maybe"}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        delay.assert_not_called()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ProductFragmentCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.products_url = reverse("products-list")
+        self.shop, _, self.product_infos = create_catalog()
+        cache.clear()
+
+    def test_list_reuses_cached_fragments(self):
+        response = self.client.get(self.products_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], len(self.product_infos))
+
+        # повторный список с другим фильтром: только count и id страницы
+        with self.assertNumQueries(2):
+            response = self.client.get(self.products_url, {"shop_id": self.shop.id})
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]],
+            [item.id for item in self.product_infos],
+        )
+
+    def test_new_catalog_version_serializes_again(self):
+        self.client.get(self.products_url)
+        ProductInfo.objects.filter(id=self.product_infos[0].id).update(price=1)
+        bump_catalog_version()
+
+        response = self.client.get(self.products_url)
+        self.assertEqual(response.json()["results"][0]["price"], 1)
+
+
+class BasketPutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.basket_url = reverse("basket")
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        self.client.force_authenticate(self.user)
+        _, _, self.product_infos = create_catalog(products_count=30)
+
+    def put_items(self, product_infos, quantity=2):
+        items = [
+            {"id": item.product_id, "quantity": quantity} for item in product_infos
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.basket_url, {"items": items}, format="json")
+        return response, len(queries)
+
+    def test_put_uses_constant_number_of_queries(self):
+        Order.objects.create(user=self.user, status="basket")
+        response, small_basket_queries = self.put_items(self.product_infos[:3])
+        self.assertTrue(response.json()["Status"])
+
+        response, large_basket_queries = self.put_items(self.product_infos, 5)
+        self.assertEqual(response.json()["Обновлено объектов"], 30)
+        self.assertEqual(large_basket_queries, small_basket_queries)
+
+        basket = Order.objects.get(user=self.user, status="basket")
+        self.assertEqual(
+            set(basket.ordered_items.values_list("quantity", flat=True)), {5}
+        )
+
+    def test_put_reports_all_invalid_lines(self):
+        items = [
+            {"id": self.product_infos[0].product_id, "quantity": 1},
+            {"id": 999999, "quantity": 1},
+            {"id": self.product_infos[1].product_id, "quantity": "много"},
+        ]
+
+        response = self.client.put(self.basket_url, {"items": items}, format="json")
+        self.assertFalse(response.json()["Status"])
+        self.assertEqual([error["line"] for error in response.json()["Errors"]], [2, 3])
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_put_stores_prices_and_totals(self):
+        self.put_items(self.product_infos[:3], quantity=2)
+        ProductInfo.objects.update(price=5000)
+
+        response = self.client.get(self.basket_url)
+        basket = response.json()[0]
+        self.assertEqual(basket["total_sum"], 3 * 2 * 1000)
+        self.assertEqual(basket["total_quantity"], 6)
+        self.assertEqual({item["price"] for item in basket["ordered_items"]}, {1000})
+
+    def test_post_adds_all_items_or_none(self):
+        items = [
+            {"product_info": self.product_infos[0].id, "quantity": 2},
+            {"product_info": self.product_infos[1].id, "quantity": "много"},
+        ]
+        response = self.client.post(
+            self.basket_url, {"items": json.dumps(items)}, format="json"
+        )
+        self.assertFalse(response.json()["Status"])
+        self.assertFalse(OrderItem.objects.filter(order__user=self.user).exists())
+
+        response = self.client.post(
+            self.basket_url, {"items": json.dumps(items[:1])}, format="json"
+        )
+        self.assertEqual(response.json()["Создано объектов"], 1)
+        basket = Order.objects.get(user=self.user, status="basket")
+        self.assertEqual((basket.total_quantity, basket.total_sum), (2, 2000))
+
+        response = self.client.post(
+            self.basket_url, {"items": json.dumps(items[:1])}, format="json"
+        )
+        self.assertFalse(response.json()["Status"])
+        basket.refresh_from_db()
+        self.assertEqual((basket.total_quantity, basket.total_sum), (2, 2000))
+
+    def test_reorder_copies_available_items(self):
+        order = Order.objects.create(user=self.user, status="delivered")
+        for product_info in self.product_infos[:3]:
+            OrderItem.objects.create(
+                order=order, product_info=product_info, quantity=4, price=900
+            )
+        ProductInfo.objects.filter(id=self.product_infos[2].id).update(quantity=3)
+        ProductInfo.objects.update(price=1100)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("order-reorder"), {"id": order.id}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["Создано объектов"], 2)
+        self.assertEqual(
+            [item["product_info_id"] for item in response.json()["unavailable"]],
+            [self.product_infos[2].id],
+        )
+        self.assertLessEqual(len(queries), 10)
+
+        basket = Order.objects.get(user=self.user, status="basket")
+        self.assertEqual((basket.total_quantity, basket.total_sum), (8, 8800))
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        self.client.force_login(self.user)
+        Order.objects.create(user=self.user, status="basket")
+        for number, order_status in enumerate(["new", "delivered", "canceled"]):
+            order = Order.objects.create(user=self.user, status=order_status)
+            Order.objects.filter(id=order.id).update(
+                dt=datetime(2024, 1, 10 + number, 12, tzinfo=dt_timezone.utc)
+            )
+
+    def test_orders_are_paginated_by_cursor(self):
+        response = self.client.get(reverse("order"), {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            [order["status"] for order in data["results"]], ["canceled", "delivered"]
+        )
+
+        response = self.client.get(data["next"])
+        self.assertEqual(
+            [order["status"] for order in response.json()["results"]], ["new"]
+        )
+
+    def test_filters_and_summary(self):
+        response = self.client.get(
+            reverse("order"),
+            {"date_from": "2024-01-10", "date_to": "2024-01-11", "summary": "1"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual([order["status"] for order in results], ["delivered", "new"])
+        self.assertNotIn("ordered_items", results[0])
+
+        response = self.client.get(reverse("order"), {"status": "canceled"})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get(reverse("order"), {"date_from": "10.01.2024"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ORDER_FEED_POLL_INTERVAL=0.01)
+class PartnerOrderFeedTests(TestCase):
+    def setUp(self):
+        self.shop, _, self.product_infos = create_catalog(products_count=1)
+        self.partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        Shop.objects.filter(id=self.shop.id).update(user=self.partner)
+        self.buyer = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        self.client.force_login(self.partner)
+        self.feed_url = reverse("partner-order-feed")
+
+    def place_order(self):
+        order = Order.objects.create(user=self.buyer, status="new")
+        OrderItem.objects.create(
+            order=order, product_info=self.product_infos[0], quantity=1, price=1000
+        )
+        record_order_changes([order.id])
+        return order
+
+    def test_feed_returns_changes_after_cursor(self):
+        order = self.place_order()
+
+        response = self.client.get(self.feed_url, {"since": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([item["id"] for item in data["orders"]], [order.id])
+        self.assertEqual(len(data["orders"][0]["ordered_items"]), 1)
+
+        response = self.client.get(
+            self.feed_url, {"since": data["cursor"], "wait": 0.05}
+        )
+        self.assertEqual(response.json()["orders"], [])
+        self.assertEqual(response.json()["cursor"], data["cursor"])
+
+    @override_settings(ORDER_FEED_LIMIT=1)
+    def test_transaction_is_not_split_between_pages(self):
+        orders = [self.place_order() for _ in range(3)]
+        OrderChange.objects.filter(order__in=orders[:2]).update(xid=10)
+        OrderChange.objects.filter(order=orders[2]).update(xid=11)
+
+        with mock.patch("supplier.feed.change_key", return_value="xid"):
+            cursor, feed = get_order_feed(self.shop.id, 0)
+            self.assertEqual((cursor, feed), (10, orders[:2]))
+            cursor, feed = get_order_feed(self.shop.id, cursor)
+            self.assertEqual((cursor, feed), (11, orders[2:]))
+
+    def test_non_finite_wait_is_rejected(self):
+        for wait in ("nan", "inf"):
+            response = self.client.get(self.feed_url, {"wait": wait})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partner_orders_lists_shop_orders(self):
+        order = self.place_order()
+
+        response = self.client.get(reverse("partner-orders"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.json()], [order.id])
+
+
+@skipUnless(connection.vendor == "postgresql", "нужны параллельные транзакции")
+class PartnerOrderFeedCommitOrderTests(TransactionTestCase):
+    def test_cursor_does_not_pass_uncommitted_changes(self):
+        shop, _, product_infos = create_catalog(products_count=1)
+        buyer = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        orders = []
+        for _ in range(2):
+            order = Order.objects.create(user=buyer, status="new")
+            OrderItem.objects.create(
+                order=order, product_info=product_infos[0], quantity=1, price=1000
+            )
+            orders.append(order)
+
+        recorded, release = threading.Event(), threading.Event()
+
+        def slow_transaction():
+            try:
+                with transaction.atomic():
+                    record_order_changes([orders[0].id])
+                    recorded.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=slow_transaction)
+        thread.start()
+        recorded.wait(5)
+        # изменение закоммичено раньше, но транзакция начата позже
+        record_order_changes([orders[1].id])
+
+        cursor, feed = get_order_feed(shop.id, 0)
+        self.assertEqual((cursor, feed), (0, []))
+
+        release.set()
+        thread.join()
+        cursor, feed = get_order_feed(shop.id, 0)
+        self.assertEqual([order.id for order in feed], [orders[0].id, orders[1].id])
+
+
+class PartnerOrderExportTests(TestCase):
+    def setUp(self):
+        shop, _, product_infos = create_catalog(products_count=2)
+        partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        Shop.objects.filter(id=shop.id).update(user=partner)
+        buyer = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        self.order = Order.objects.create(user=buyer, status="new")
+        for product_info in product_infos:
+            OrderItem.objects.create(
+                order=self.order, product_info=product_info, quantity=2, price=1000
+            )
+        Order.objects.create(user=buyer, status="basket")
+        self.client.force_login(partner)
+        self.export_url = reverse("partner-order-export")
+
+    def test_csv_export(self):
+        response = self.client.get(self.export_url, {"file_format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["order"], str(self.order.id))
+        self.assertEqual(rows[0]["total_amount"], "2000")
+
+    def test_xlsx_export(self):
+        response = self.client.get(
+            self.export_url, {"file_format": "xlsx", "date_from": "2000-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        self.assertEqual(rows[0][0], "order")
+        self.assertEqual(len(rows), 3)
+
+
+@override_settings(BASKET_CLEANUP_BATCH_SIZE=1)
+class BasketCleanupTests(TestCase):
+    def test_only_abandoned_baskets_are_removed(self):
+        _, _, product_infos = create_catalog(products_count=1)
+        baskets = []
+        for number in range(3):
+            user = User.objects.create_user(
+                email=f"buyer{number}@example.com",
+                username=f"buyer{number}",
+                password="StrongPassword123",
+            )
+            basket = Order.objects.create(user=user, status="basket")
+            OrderItem.objects.create(
+                order=basket, product_info=product_infos[0], quantity=1
+            )
+            baskets.append(basket)
+        old_order = Order.objects.create(user=user, status="new")
+
+        Order.objects.filter(
+            id__in=[baskets[0].id, baskets[1].id, old_order.id]
+        ).update(updated_at=timezone.now() - timedelta(days=31))
+
+        result = cleanup_abandoned_baskets()
+        self.assertEqual((result["orders"], result["items"]), (2, 2))
+        self.assertEqual(
+            set(Order.objects.values_list("id", flat=True)),
+            {baskets[2].id, old_order.id},
+        )
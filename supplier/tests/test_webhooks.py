@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from supplier.feed import record_order_changes
+from supplier.models import (Category, Order, OrderItem, PartnerWebhook,
+                             Product, ProductInfo, Shop)
+from supplier.webhooks import SIGNATURE_HEADER, deliver_webhook, due_webhooks
+
+User = get_user_model()
+
+
+class PartnerStub(BaseHTTPRequestHandler):
+    """
+    Сервер поставщика: запоминает полученные запросы и отвечает кодом status
+    """
+
+    status = 200
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append((dict(self.headers), body))
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def resolves_to(address):
+    return mock.patch(
+        "supplier.webhooks.socket.getaddrinfo",
+        return_value=[(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 443))],
+    )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    WEBHOOK_REQUIRE_PUBLIC_HTTPS=False,
+)
+class PartnerWebhookTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(("127.0.0.1", 0), PartnerStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        PartnerStub.status = 200
+        PartnerStub.received = []
+        self.partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        self.shop = Shop.objects.create(name="DNS-shop", user=self.partner)
+        category = Category.objects.create(name="Смартфоны")
+        product = Product.objects.create(
+            external_id=1, name="Смартфон", category=category, shop=self.shop
+        )
+        self.product_info = ProductInfo.objects.create(
+            model="model",
+            quantity=5,
+            price=1000,
+            price_rrc=1200,
+            product=product,
+            shop=self.shop,
+        )
+        self.buyer = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+
+        self.client.force_login(self.partner)
+        response = self.client.post(
+            reverse("partner-webhook"),
+            {"url": f"http://127.0.0.1:{self.server.server_port}/orders"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.secret = response.json()["secret"]
+        self.webhook = PartnerWebhook.objects.get(shop=self.shop)
+
+    def place_order(self):
+        order = Order.objects.create(user=self.buyer, status="new")
+        OrderItem.objects.create(
+            order=order, product_info=self.product_info, quantity=1, price=1000
+        )
+        record_order_changes([order.id])
+        return order
+
+    def test_new_orders_are_delivered_signed(self):
+        self.assertFalse(due_webhooks().exists())
+        order = self.place_order()
+        self.assertTrue(due_webhooks().exists())
+
+        self.assertEqual(deliver_webhook(self.webhook.id), 1)
+
+        headers, body = PartnerStub.received[0]
+        expected = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers[SIGNATURE_HEADER], f"sha256={expected}")
+        self.assertEqual(
+            [item["id"] for item in json.loads(body)["orders"]], [order.id]
+        )
+
+        self.assertFalse(due_webhooks().exists())
+        self.assertEqual(deliver_webhook(self.webhook.id), 0)
+        self.assertEqual(len(PartnerStub.received), 1)
+
+    def test_failed_delivery_backs_off(self):
+        PartnerStub.status = 500
+        self.place_order()
+
+        self.assertEqual(deliver_webhook(self.webhook.id), 0)
+
+        self.webhook.refresh_from_db()
+        self.assertEqual(self.webhook.failures, 1)
+        self.assertEqual(self.webhook.last_change_id, 0)
+        self.assertGreater(self.webhook.next_attempt_at, timezone.now())
+        self.assertFalse(due_webhooks().exists())
+
+    def test_expired_lock_of_another_worker_is_kept(self):
+        self.place_order()
+        lock = f"webhook:lock:{self.webhook.id}"
+
+        def post(*args, **kwargs):
+            # доставка затянулась, блокировка истекла и досталась другому воркеру
+            cache.set(lock, "other-worker")
+            response = requests.Response()
+            response.status_code = 200
+            return response
+
+        with mock.patch("supplier.webhooks.get_session") as get_session:
+            get_session.return_value.post.side_effect = post
+            self.assertEqual(deliver_webhook(self.webhook.id), 1)
+
+        self.assertEqual(cache.get(lock), "other-worker")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class WebhookUrlTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.partner = User.objects.create_user(
+            email="partner@example.com",
+            username="partner",
+            password="StrongPassword123",
+            type="shop",
+        )
+        self.shop = Shop.objects.create(name="DNS-shop", user=self.partner)
+        self.client.force_login(self.partner)
+
+    def register(self, url):
+        return self.client.post(reverse("partner-webhook"), {"url": url})
+
+    def test_private_addresses_are_rejected(self):
+        for address in ("127.0.0.1", "10.0.0.5", "169.254.169.254", "::1"):
+            with resolves_to(address):
+                response = self.register("https://partner.example.com/orders")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PartnerWebhook.objects.exists())
+
+    def test_https_is_required(self):
+        with resolves_to("93.184.216.34"):
+            response = self.register("http://partner.example.com/orders")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_address_is_checked_again_before_sending(self):
+        with resolves_to("93.184.216.34"):
+            response = self.register("https://partner.example.com/orders")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        webhook = PartnerWebhook.objects.get()
+
+        category = Category.objects.create(name="Смартфоны")
+        product = Product.objects.create(
+            external_id=1, name="Смартфон", category=category, shop=self.shop
+        )
+        product_info = ProductInfo.objects.create(
+            model="model",
+            quantity=5,
+            price=1000,
+            price_rrc=1200,
+            product=product,
+            shop=self.shop,
+        )
+        buyer = User.objects.create_user(
+            email="buyer@example.com", password="StrongPassword123"
+        )
+        order = Order.objects.create(user=buyer, status="new")
+        OrderItem.objects.create(
+            order=order, product_info=product_info, quantity=1, price=1000
+        )
+        record_order_changes([order.id])
+
+        with resolves_to("10.0.0.5"), mock.patch(
+            "supplier.webhooks.get_session"
+        ) as get_session:
+            self.assertEqual(deliver_webhook(webhook.id), 0)
+
+        get_session.return_value.post.assert_not_called()
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.failures, 1)
+        self.assertIn("внутреннюю сеть", webhook.last_error)
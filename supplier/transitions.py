@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from supplier.feed import record_order_changes
+from supplier.models import STATUS_CHOICES, Notification, Order, OrderItem
+from supplier.notifications import enqueue_notifications
+from supplier.stock import cancel_orders
+
+# допустимые переходы статусов заказа поставщиком
+ORDER_TRANSITIONS = {
+    "new": ("confirmed", "canceled"),
+    "confirmed": ("assembled", "canceled"),
+    "assembled": ("sent",),
+    "sent": ("delivered",),
+}
+
+
+def allowed_sources(new_status: str) -> list:
+    return [
+        source for source, targets in ORDER_TRANSITIONS.items() if new_status in targets
+    ]
+
+
+def transition_orders(shop_id: int, order_ids, new_status: str) -> tuple:
+    """
+    Переводим заказы с товарами магазина в статус new_status одним UPDATE.
+    Заказы, для которых переход недопустим, не меняются. Статус общий
+    для всего заказа, поэтому заказы с товарами других магазинов
+    поставщик не меняет и не отменяет.
+    Возвращает (id измененных заказов, {id заказа: ошибка})
+    """
+    order_ids = set(order_ids)
+    items = OrderItem.objects.filter(order_id=OuterRef("pk"))
+    with transaction.atomic():
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(
+                Exists(items.filter(product_info__shop_id=shop_id)), id__in=order_ids
+            )
+            .annotate(shared=Exists(items.exclude(product_info__shop_id=shop_id)))
+            .order_by("id")
+            .values_list("id", "status", "shared")
+        )
+        current = {order_id: status for order_id, status, _ in rows}
+        shared = {order_id for order_id, _, is_shared in rows if is_shared}
+        sources = allowed_sources(new_status)
+        updated = [
+            order_id
+            for order_id, status in current.items()
+            if status in sources and order_id not in shared
+        ]
+
+        if updated:
+            if new_status == "canceled":
+                # отмена возвращает товар на склад и пишет журнал изменений
+                updated = cancel_orders(updated)
+            else:
+                Order.objects.filter(id__in=updated).update(status=new_status)
+                record_order_changes(updated)
+
+            label = dict(STATUS_CHOICES)[new_status]
+            enqueue_notifications(
+                Notification(
+                    email=email,
+                    subject=f"Заказ №{order_id}: {label}",
+                    message=f"Статус вашего заказа №{order_id} изменен: {label}",
+                    dedup_key=f"order:{order_id}:{new_status}:client",
+                )
+                for order_id, email in Order.objects.filter(id__in=updated).values_list(
+                    "id", "user__email"
+                )
+            )
+
+    errors = {}
+    for order_id in sorted(order_ids - set(updated)):
+        if order_id not in current:
+            errors[order_id] = "Заказ не найден"
+        elif order_id in shared:
+            errors[order_id] = "Заказ содержит товары других магазинов"
+        else:
+            errors[
+                order_id
+            ] = f"Переход из статуса {current[order_id]} в {new_status} недопустим"
+    return updated, errors
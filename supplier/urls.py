@@ -5,10 +5,13 @@ from drf_spectacular.views import (SpectacularAPIView, SpectacularRedocView,
                                    SpectacularSwaggerView)
 from rest_framework import routers
 
-from .views import (AccountDetails, BasketView, CategoryView, ConfirmAccount,
-                    ContactView, LoginAccount, OrderView, PartnerOrders,
-                    PartnerState, PartnerUpdate, ProductInfoView,
-                    RegisterAccount, ShopView)
+from .views import (AccountDetails, BasketView, BulkOrderView,
+                    BulkRegisterAccounts, CatalogSnapshotView, CategoryView,
+                    ConfirmAccount, ContactView, LoginAccount, LogoutAccount,
+                    OrderView, PartnerAnalytics, PartnerOrderExport,
+                    PartnerOrderFeed, PartnerOrders, PartnerOrderStatus,
+                    PartnerState, PartnerUpdate, PartnerWebhookView,
+                    ProductInfoView, RegisterAccount, ReorderView, ShopView)
 
 router = routers.DefaultRouter()
 router.register(r"shops", ShopView)
@@ -28,18 +31,44 @@ urlpatterns = [
     path("partner/update", PartnerUpdate.as_view(), name="partner-update"),
     path("partner/state", PartnerState.as_view(), name="partner-state"),
     path("partner/orders", PartnerOrders.as_view(), name="partner-orders"),
+    path("partner/orders/feed", PartnerOrderFeed.as_view(), name="partner-order-feed"),
+    path(
+        "partner/orders/export",
+        PartnerOrderExport.as_view(),
+        name="partner-order-export",
+    ),
+    path(
+        "partner/orders/status",
+        PartnerOrderStatus.as_view(),
+        name="partner-order-status",
+    ),
+    path("partner/analytics", PartnerAnalytics.as_view(), name="partner-analytics"),
+    path("partner/webhook", PartnerWebhookView.as_view(), name="partner-webhook"),
     path("user/register", RegisterAccount.as_view(), name="user-register"),
+    path(
+        "user/bulk_register",
+        BulkRegisterAccounts.as_view(),
+        name="user-bulk-register",
+    ),
     path("user/register/confirm", ConfirmAccount.as_view(), name="confirm-email"),
     path("user/details", AccountDetails.as_view(), name="user-details"),
     path("user/contact", ContactView.as_view(), name="user-contact"),
     path("user/login", LoginAccount.as_view(), name="user-login"),
+    path("user/logout", LogoutAccount.as_view(), name="user-logout"),
     path("user/password_reset", reset_password_request_token, name="password-reset"),
     path(
         "user/password_reset/confirm",
         reset_password_confirm,
         name="password-reset-confirm",
     ),
+    path(
+        "catalog/<slug:scope>/<int:page>",
+        CatalogSnapshotView.as_view(),
+        name="catalog-snapshot",
+    ),
     path("basket", BasketView.as_view(), name="basket"),
     path("order", OrderView.as_view(), name="order"),
+    path("order/bulk", BulkOrderView.as_view(), name="order-bulk"),
+    path("order/reorder", ReorderView.as_view(), name="order-reorder"),
     path("", include(router.urls)),
 ]
@@ -1,38 +1,105 @@
+import logging
+import math
+import os
+import secrets
+import tempfile
+from datetime import datetime, time, timedelta
 from distutils.util import strtobool
+from pathlib import Path
 
 from django.conf import settings
-from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.core.mail import EmailMultiAlternatives, send_mail
-from django.db import IntegrityError
-from django.db.models import F, Q, Sum
+from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.db.models.query import Prefetch
-from django.http import JsonResponse
-from django.template.loader import render_to_string
+from django.http import (FileResponse, Http404, HttpResponseNotModified,
+                         JsonResponse, StreamingHttpResponse)
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
-from django_rest_passwordreset.tokens import get_token_generator
+from django.views import View
 from drf_spectacular.utils import extend_schema
+from kombu.exceptions import OperationalError
 from requests import get
 from rest_framework import status, viewsets
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from ujson import dumps as dump_json
 from ujson import loads as load_json
 
+from customer.hashing import HashingBusy, hash_password, verify_user_password
 from customer.models import ConfirmEmailToken, Contact, User
-from supplier.tasks import import_shop_data
-
-from .models import (Category, Order, OrderItem, Parameter, Product,
+from customer.onboarding import validate_onboarding_rows
+from supplier.catalog import SNAPSHOT_CURRENT, get_product_fragments
+from supplier.tasks import (build_catalog_snapshots, import_shop_data,
+                            register_users_chunk)
+
+from .analytics import add_order_sales, previous_period, shop_sales_report
+from .basket import (RedisBasket, redis_basket_enabled, refresh_order_totals,
+                     reorder_into_basket, reorder_into_redis_basket,
+                     resolve_basket_items, upsert_basket_items)
+from .export import iter_chunks, iter_csv, iter_gzip, iter_ndjson, write_xlsx
+from .feed import (get_order_feed, last_cursor, record_order_changes,
+                   wait_for_changes)
+from .idempotency import idempotent
+from .models import (STATUS_CHOICES, Category, CategoryProductCount, Order,
+                     OrderItem, Parameter, PartnerWebhook, Product,
                      ProductInfo, ProductParameter, Shop)
-from .serializers import (CategorySerializer, ContactSerializer,
-                          OrderItemSerializer, OrderSerializer,
-                          ProductInfoSerializer, ShopSerializer,
-                          UserSerializer)
+from .notifications import (confirmation_notification, enqueue_notifications,
+                            order_placed_notifications)
+from .serializers import (CategoryCountSerializer, CategorySerializer,
+                          ContactSerializer, OrderItemSerializer,
+                          OrderSerializer, OrderSummarySerializer,
+                          PartnerWebhookSerializer, ProductInfoSerializer,
+                          ShopSerializer, UserSerializer)
 from .signals import new_user_registered
+from .stock import InsufficientStock, order_quantities, reserve_stock
+from .transitions import allowed_sources, transition_orders
+from .webhooks import UnsafeWebhookUrl, check_webhook_url
+
+logger = logging.getLogger(__name__)
+
+CATALOG_EXPORT_FIELDS = (
+    "id",
+    "model",
+    "product",
+    "category",
+    "shop",
+    "quantity",
+    "price",
+    "price_rrc",
+    "parameters",
+)
+
+ORDER_EXPORT_FIELDS = (
+    "order",
+    "dt",
+    "status",
+    "product_info",
+    "model",
+    "product",
+    "quantity",
+    "price",
+    "total_amount",
+)
+
+
+def hashing_busy_response():
+    response = JsonResponse(
+        {"Status": False, "Errors": "Сервис перегружен, повторите запрос позже"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = "1"
+    return response
 
 
 class RegisterAccount(APIView):
@@ -64,10 +131,16 @@ class RegisterAccount(APIView):
             # проверка имени
             user_serializer = UserSerializer(data=request.data)
             if user_serializer.is_valid():
-                user = self.create_inactive_user(
-                    user_serializer.data, request.data["password"]
-                )
-                self.send_confirmation_email(user)
+                # хешируем до транзакции, чтобы не держать ее открытой
+                try:
+                    password_hash = hash_password(request.data["password"])
+                except HashingBusy:
+                    return hashing_busy_response()
+                with transaction.atomic():
+                    user = self.create_inactive_user(
+                        user_serializer.data, password_hash
+                    )
+                    self.send_confirmation_email(user)
                 return JsonResponse(
                     {
                         "Status": True,
@@ -77,36 +150,64 @@ class RegisterAccount(APIView):
             else:
                 return JsonResponse({"Status": False, "Errors": user_serializer.errors})
 
-    def create_inactive_user(self, data, password):
-        user = User.objects.create(**data)
-        user.set_password(password)
-        user.is_active = False
-        user.save()
-        return user
+    def create_inactive_user(self, data, password_hash):
+        return User.objects.create(**data, password=password_hash, is_active=False)
 
     def send_confirmation_email(self, user):
         # Создаем токен для подтверждения email
-        token_generator = get_token_generator()
         token = ConfirmEmailToken.objects.create(user=user)
 
-        # Формируем ссылку на подтверждение регистрации
-        confirmation_link = f"{settings.BASE_URL}/user/register/confirm?token={token.key}&email={user.email}"
+        # Ставим письмо со ссылкой на подтверждение в очередь отправки
+        enqueue_notifications([confirmation_notification(user.email, token.key)])
 
-        # Отправляем письмо с токеном по электронной почте
-        subject = "Подтверждение регистрации"
-        text_message = (
-            f"Для подтверждения регистрации перейдите по ссылке: {confirmation_link}"
-        )
-        html_message = render_to_string(
-            "email_templates/confirmation_email_template.html",
-            {"confirmation_link": confirmation_link},
-        )
-        from_email = settings.DEFAULT_FROM_EMAIL
-        to_email = user.email
 
-        msg = EmailMultiAlternatives(subject, text_message, from_email, [to_email])
-        msg.attach_alternative(html_message, "text/html")
-        msg.send()
+class BulkRegisterAccounts(APIView):
+    """
+    Массовая регистрация покупателей сети сотрудником магазина.
+    POST user/bulk_register {"users": [{"email", "password", ...}]}.
+    Список проверяется сразу, регистрация идет частями в задачах Celery
+    """
+
+    throttle_scope = "user"
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse(
+                {"Status": False, "Error": "Только для сотрудников"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        rows = request.data.get("users")
+        if not isinstance(rows, list) or not rows:
+            return JsonResponse(
+                {"Status": False, "Errors": "Не указаны пользователи"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(rows) > settings.ONBOARDING_MAX_USERS:
+            return JsonResponse(
+                {
+                    "Status": False,
+                    "Errors": f"Не больше {settings.ONBOARDING_MAX_USERS} "
+                    f"пользователей за запрос",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        errors = validate_onboarding_rows(rows)
+        if errors:
+            return JsonResponse(
+                {"Status": False, "Errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        chunk_size = settings.ONBOARDING_CHUNK_SIZE
+        for start in range(0, len(rows), chunk_size):
+            register_users_chunk.delay(rows[start : start + chunk_size])
+
+        return JsonResponse(
+            {"Status": True, "users": len(rows)}, status=status.HTTP_202_ACCEPTED
+        )
 
 
 class ConfirmAccount(APIView):
@@ -166,17 +267,19 @@ class LoginAccount(APIView):
 
     def post(self, request, *args, **kwargs):
         if {"email", "password"}.issubset(request.data):
-            user = authenticate(
-                request,
-                username=request.data["email"],
-                password=request.data["password"],
-            )
-
-            if user is not None:
-                if user.is_active:
+            # пароль проверяется в пуле процессов, а не в потоке запроса
+            user = User.objects.filter(email=request.data["email"]).first()
+            try:
+                if user is None or not user.is_active:
+                    # время ответа не должно выдавать, есть ли такой email
+                    # и активен ли пользователь
+                    hash_password(request.data["password"])
+                elif verify_user_password(user, request.data["password"]):
                     token, _ = Token.objects.get_or_create(user=user)
 
                     return Response({"Status": True, "Token": token.key})
+            except HashingBusy:
+                return hashing_busy_response()
 
             return Response(
                 {"Status": False, "Errors": "Не удалось авторизовать"},
@@ -189,6 +292,26 @@ class LoginAccount(APIView):
         )
 
 
+class LogoutAccount(APIView):
+    """
+    Класс для выхода пользователя: токен удаляется и сбрасывается в кэше
+    """
+
+    throttle_scope = "user"
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        # delete() по одному объекту, чтобы сработал сигнал сброса кэша
+        for token in Token.objects.filter(user_id=request.user.id):
+            token.delete()
+        return Response({"Status": True})
+
+
 class AccountDetails(APIView):
     """
     Класс для работы данными пользователя
@@ -224,7 +347,10 @@ class AccountDetails(APIView):
                     {"Status": False, "Errors": {"password": password_error}}
                 )
             else:
-                request.user.set_password(request.data["password"])
+                try:
+                    request.user.password = hash_password(request.data["password"])
+                except HashingBusy:
+                    return hashing_busy_response()
 
         # Проверяем остальные данные
         user_serializer = UserSerializer(request.user, data=request.data, partial=True)
@@ -247,6 +373,30 @@ class CategoryView(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     ordering = ("name",)
 
+    def with_counts(self):
+        try:
+            return strtobool(self.request.query_params.get("with_counts", "false"))
+        except ValueError:
+            return False
+
+    # количество товаров: categories?with_counts=true
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.with_counts():
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "product_counts",
+                    queryset=CategoryProductCount.objects.filter(shop__state=True),
+                    to_attr="active_counts",
+                )
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.with_counts():
+            return CategoryCountSerializer
+        return super().get_serializer_class()
+
 
 class ShopView(viewsets.ModelViewSet):
     """
@@ -267,8 +417,7 @@ class ProductInfoView(viewsets.ReadOnlyModelViewSet):
     serializer_class = ProductInfoSerializer
     ordering = ("product",)
 
-    @extend_schema(responses=CategorySerializer)
-    def get_queryset(self):
+    def get_filter_query(self):
         query = Q(shop__state=True)
         shop_id = self.request.query_params.get("shop_id")
         category_id = self.request.query_params.get("category_id")
@@ -279,9 +428,13 @@ class ProductInfoView(viewsets.ReadOnlyModelViewSet):
         if category_id:
             query = query & Q(product__category_id=category_id)
 
+        return query
+
+    @extend_schema(responses=CategorySerializer)
+    def get_queryset(self):
         # фильтруем и отбрасываем дуликаты
         queryset = (
-            ProductInfo.objects.filter(query)
+            ProductInfo.objects.filter(self.get_filter_query())
             .select_related("shop", "product__category")
             .prefetch_related("product_parameters__parameter")
             .distinct()
@@ -289,6 +442,227 @@ class ProductInfoView(viewsets.ReadOnlyModelViewSet):
 
         return queryset
 
+    # карточки товаров страницы берутся из кэша, сериализуются только промахи
+    def list(self, request, *args, **kwargs):
+        product_ids = (
+            ProductInfo.objects.filter(self.get_filter_query())
+            .order_by("id")
+            .values_list("id", flat=True)
+            .distinct()
+        )
+        page = self.paginate_queryset(product_ids)
+        data = get_product_fragments(
+            page,
+            lambda ids: self.get_serializer(
+                self.get_queryset().filter(id__in=ids), many=True
+            ).data,
+        )
+        return self.get_paginated_response(data)
+
+    # получить несколько товаров за один запрос: products/batch?ids=1,2,3
+    @action(detail=False, methods=["get", "post"], url_path="batch")
+    def batch(self, request, *args, **kwargs):
+        if request.method == "POST":
+            ids = request.data.get("ids")
+        else:
+            ids = request.query_params.get("ids", "").split(",")
+
+        if not isinstance(ids, list) or not ids:
+            return Response(
+                {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # длину проверяем до разбора, чтобы не обрабатывать огромные списки
+        if len(ids) > settings.PRODUCT_BATCH_MAX_IDS:
+            return Response(
+                {
+                    "Status": False,
+                    "Errors": f"Можно запросить не более {settings.PRODUCT_BATCH_MAX_IDS} товаров",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        parsed_ids = []
+        for product_id in ids:
+            product_id = str(product_id).strip()
+            if not product_id.isdigit():
+                return Response(
+                    {"Status": False, "Errors": f"Неверный id товара: {product_id}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            parsed_ids.append(int(product_id))
+        product_ids = list(dict.fromkeys(parsed_ids))
+
+        # один запрос на товары и один на параметры, порядок как в запросе
+        products = {
+            product_info.id: product_info
+            for product_info in ProductInfo.objects.filter(
+                id__in=product_ids, shop__state=True
+            )
+            .select_related("shop", "product__category")
+            .prefetch_related(
+                Prefetch(
+                    "product_parameters",
+                    queryset=ProductParameter.objects.select_related("parameter"),
+                )
+            )
+        }
+        found = [products[pk] for pk in product_ids if pk in products]
+
+        serializer = self.get_serializer(found, many=True)
+        return Response(
+            {
+                "results": serializer.data,
+                "not_found": [pk for pk in product_ids if pk not in products],
+            }
+        )
+
+    # выгрузить весь каталог магазина или категории потоком:
+    # products/export?shop_id=1&file_format=csv&gzip=true (ndjson по умолчанию)
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request, *args, **kwargs):
+        shop_id = request.query_params.get("shop_id")
+        category_id = request.query_params.get("category_id")
+        export_format = request.query_params.get("file_format", "ndjson")
+
+        if not (shop_id or category_id) or export_format not in ("ndjson", "csv"):
+            return Response(
+                {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            use_gzip = strtobool(request.query_params.get("gzip", "false"))
+        except ValueError as error:
+            return Response(
+                {"Status": False, "Errors": str(error)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # без пагинации и distinct: строки читаются пачками фиксированного размера
+        queryset = (
+            ProductInfo.objects.filter(self.get_filter_query())
+            .select_related("shop", "product__category")
+            .prefetch_related(
+                Prefetch(
+                    "product_parameters",
+                    queryset=ProductParameter.objects.select_related("parameter"),
+                )
+            )
+            .order_by("id")
+        )
+        rows = (
+            {
+                "id": product_info.id,
+                "model": product_info.model,
+                "product": product_info.product.name,
+                "category": product_info.product.category.name,
+                "shop": product_info.shop_id,
+                "quantity": product_info.quantity,
+                "price": product_info.price,
+                "price_rrc": product_info.price_rrc,
+                "parameters": {
+                    product_parameter.parameter.name: product_parameter.value
+                    for product_parameter in product_info.product_parameters.all()
+                },
+            }
+            for product_info in queryset.iterator(
+                chunk_size=settings.CATALOG_EXPORT_CHUNK_SIZE
+            )
+        )
+
+        if export_format == "csv":
+            lines = iter_csv(
+                (dict(row, parameters=dump_json(row["parameters"])) for row in rows),
+                CATALOG_EXPORT_FIELDS,
+            )
+            content_type = "text/csv; charset=utf-8"
+        else:
+            lines = iter_ndjson(rows)
+            content_type = "application/x-ndjson; charset=utf-8"
+
+        chunks = iter_chunks(lines)
+        if use_gzip:
+            chunks = iter_gzip(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        if use_gzip:
+            response["Content-Encoding"] = "gzip"
+        file_name = f"catalog_{shop_id or 'all'}_{category_id or 'all'}.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+
+
+def parse_accept_encoding(header: str) -> set:
+    """
+    Кодировки из заголовка Accept-Encoding, которые клиент принимает.
+    Кодировки с q=0 клиент явно отклоняет, поэтому их не возвращаем
+    """
+    encodings = set()
+    for token in header.split(","):
+        encoding, *params = [part.strip() for part in token.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if encoding and quality > 0:
+            encodings.add(encoding.lower())
+    return encodings
+
+
+class CatalogSnapshotView(View):
+    """
+    Класс для отдачи готовых снимков каталога анонимным пользователям.
+    Не обращается к БД и сериализаторам: файлы собираются после загрузки прайса,
+    каталог CATALOG_SNAPSHOT_ROOT/current также можно отдавать веб-сервером
+    """
+
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+
+    def get(self, request, scope, page, *args, **kwargs):
+        root = Path(settings.CATALOG_SNAPSHOT_ROOT)
+        try:
+            build = os.readlink(root / SNAPSHOT_CURRENT)
+        except OSError:
+            raise Http404("Снимок каталога еще не собран")
+
+        path = root / build / scope / f"{page}.json"
+        accept_encoding = parse_accept_encoding(
+            request.headers.get("Accept-Encoding", "")
+        )
+        content_encoding = None
+        for encoding, suffix in self.encodings:
+            encoded_path = path.with_name(path.name + suffix)
+            if encoding in accept_encoding and encoded_path.exists():
+                path = encoded_path
+                content_encoding = encoding
+                break
+
+        etag = f'"{build}-{scope}-{page}-{content_encoding or "identity"}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                response = FileResponse(
+                    open(path, "rb"), content_type="application/json"
+                )
+            except FileNotFoundError:
+                raise Http404("Страница не найдена")
+            if content_encoding:
+                response["Content-Encoding"] = content_encoding
+
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_SNAPSHOT_MAX_AGE
+        )
+        return response
+
 
 class BasketView(APIView):
     """
@@ -305,27 +679,70 @@ class BasketView(APIView):
                 {"Status": False, "Error": "Log in required"},
                 status=status.HTTP_403_FORBIDDEN,
             )
+
+        if redis_basket_enabled():
+            return Response(self.get_redis_basket(request.user.id))
+
+        basket = Order.objects.filter(
+            user_id=request.user.id, status="basket"
+        ).prefetch_related(
+            "ordered_items__product_info__product__category",
+            "ordered_items__product_info__product_parameters__parameter",
+        )
+
+        serializer = OrderSerializer(basket, many=True)
+        return Response(serializer.data)
+
+    # корзина из Redis в том же формате, что и OrderSerializer;
+    # id позиции совпадает с id ProductInfo
+    def get_redis_basket(self, user_id):
+        items = RedisBasket(user_id).items()
         basket = (
-            Order.objects.filter(user_id=request.user.id, status="basket")
+            Order.objects.filter(user_id=user_id, status="basket")
+            .only("id", "status", "dt")
+            .first()
+        )
+        if basket is None:
+            if not items:
+                return []
+            # id корзины нужен для оформления, создаем ее один раз
+            basket, _ = Order.objects.get_or_create(user_id=user_id, status="basket")
+        product_infos = (
+            ProductInfo.objects.filter(id__in=items)
+            .select_related("product__category")
             .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
+                Prefetch(
+                    "product_parameters",
+                    queryset=ProductParameter.objects.select_related("parameter"),
                 )
             )
-            .distinct()
         )
+        ordered_items = [
+            {
+                "id": product_info.id,
+                "product_info": ProductInfoSerializer(product_info).data,
+                "quantity": items[product_info.id],
+            }
+            for product_info in product_infos
+        ]
+        return [
+            {
+                "id": basket.id,
+                "ordered_items": ordered_items,
+                "status": basket.status,
+                "dt": basket.dt,
+                "total_sum": sum(
+                    item["product_info"]["price"] * item["quantity"]
+                    for item in ordered_items
+                ),
+                "contact": None,
+            }
+        ]
 
-        serializer = OrderSerializer(basket, many=True)
-        return Response(serializer.data)
-
-        # редактировать корзину
+    # редактировать корзину
 
     @extend_schema(responses=CategorySerializer)
+    @idempotent
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -342,22 +759,33 @@ class BasketView(APIView):
                     {"Status": False, "Errors": "Неверный формат запроса"}
                 )
 
-            basket, _ = Order.objects.get_or_create(
-                user_id=request.user.id, state="basket"
-            )
+            # позиции добавляются все или ни одной, вместе с итогами корзины
             objects_created = 0
-            for order_item in items_dict:
-                order_item.update({"order": basket.id})
-                serializer = OrderItemSerializer(data=order_item)
-                if serializer.is_valid():
-                    try:
-                        serializer.save()
+            errors = None
+            try:
+                with transaction.atomic():
+                    basket, _ = Order.objects.get_or_create(
+                        user_id=request.user.id, status="basket"
+                    )
+                    for order_item in items_dict:
+                        order_item.update({"order": basket.id})
+                        serializer = OrderItemSerializer(data=order_item)
+                        if not serializer.is_valid():
+                            errors = serializer.errors
+                            transaction.set_rollback(True)
+                            break
+                        # цена фиксируется в момент добавления в корзину
+                        serializer.save(
+                            price=serializer.validated_data["product_info"].price
+                        )
                         objects_created += 1
-                    except IntegrityError as error:
-                        return JsonResponse({"Status": False, "Errors": str(error)})
-                else:
-                    return JsonResponse({"Status": False, "Errors": serializer.errors})
+                    else:
+                        refresh_order_totals([basket.id])
+            except IntegrityError as error:
+                return JsonResponse({"Status": False, "Errors": str(error)})
 
+            if errors is not None:
+                return JsonResponse({"Status": False, "Errors": errors})
             return JsonResponse({"Status": True, "Создано объектов": objects_created})
 
         return JsonResponse(
@@ -374,10 +802,15 @@ class BasketView(APIView):
             )
 
         items_sting = request.data.get("items")
-        if items_sting:
+        if items_sting and redis_basket_enabled():
+            items_list = [item for item in items_sting.split(",") if item.isdigit()]
+            if items_list:
+                deleted_count = RedisBasket(request.user.id).remove_items(items_list)
+                return JsonResponse({"Status": True, "Удалено объектов": deleted_count})
+        elif items_sting:
             items_list = items_sting.split(",")
             basket, _ = Order.objects.get_or_create(
-                user_id=request.user.id, state="basket"
+                user_id=request.user.id, status="basket"
             )
             query = Q()
             objects_deleted = False
@@ -387,7 +820,9 @@ class BasketView(APIView):
                     objects_deleted = True
 
             if objects_deleted:
-                deleted_count = OrderItem.objects.filter(query).delete()[0]
+                with transaction.atomic():
+                    deleted_count = OrderItem.objects.filter(query).delete()[0]
+                    refresh_order_totals([basket.id])
                 return JsonResponse({"Status": True, "Удалено объектов": deleted_count})
 
         return JsonResponse(
@@ -396,6 +831,7 @@ class BasketView(APIView):
 
     # добавить позиции в корзину
     @extend_schema(responses=CategorySerializer)
+    @idempotent
     def put(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -405,46 +841,29 @@ class BasketView(APIView):
 
         items_list = request.data.get("items")
         if items_list:
-            basket, created = Order.objects.get_or_create(
-                user_id=request.user.id, status="basket"
-            )
-
-            if created:
-                basket.state = "basket"
-                basket.save()
+            if not isinstance(items_list, list):
+                return JsonResponse(
+                    {"Status": False, "Errors": "Неверный формат данных в запросе"}
+                )
 
-            objects_updated = 0
-            for order_item_data in items_list:
-                product_id = order_item_data.get("id")
-                quantity = order_item_data.get("quantity")
+            # все товары одним запросом, ошибки по всем строкам сразу
+            quantities, errors = resolve_basket_items(items_list)
+            if errors:
+                return JsonResponse({"Status": False, "Errors": errors})
 
-                if isinstance(product_id, int) and isinstance(quantity, int):
-                    try:
-                        product_info = ProductInfo.objects.get(product_id=product_id)
-                        order_item, created = OrderItem.objects.get_or_create(
-                            order=basket,
-                            product_info=product_info,
-                            defaults={"quantity": quantity},
-                        )
+            if redis_basket_enabled():
+                objects_updated = RedisBasket(request.user.id).set_items(quantities)
+                return JsonResponse(
+                    {"Status": True, "Обновлено объектов": objects_updated}
+                )
 
-                        if not created:
-                            order_item.quantity = quantity
-                            order_item.save()
-
-                        objects_updated += 1
-                    except ProductInfo.DoesNotExist:
-                        return JsonResponse(
-                            {
-                                "Status": False,
-                                "Errors": f"Товар с id {product_id} не найден",
-                            }
-                        )
-                else:
-                    return JsonResponse(
-                        {"Status": False, "Errors": "Неверный формат данных в запросе"}
-                    )
+            with transaction.atomic():
+                basket, _ = Order.objects.get_or_create(
+                    user_id=request.user.id, status="basket"
+                )
+                objects_updated = upsert_basket_items(basket, quantities)
+                refresh_order_totals([basket.id])
 
-            print("Objects updated:", objects_updated)
             return JsonResponse({"Status": True, "Обновлено объектов": objects_updated})
 
         return JsonResponse(
@@ -452,14 +871,65 @@ class BasketView(APIView):
         )
 
 
+class OrderCursorPagination(CursorPagination):
+    """
+    Постраничная история заказов по курсору (dt, id),
+    чтобы время ответа не зависело от номера страницы
+    """
+
+    ordering = ("-dt", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+def parse_order_date(value: str, end: bool = False):
+    """
+    Дата или дата-время из параметра запроса. Для даты без времени
+    берется начало дня, а для конца периода - начало следующего дня
+    """
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
 class OrderView(APIView):
     """
-    Класс для получения и размещения заказов пользователями
+    Класс для получения и размещения заказов пользователями.
+    Заказы, перенесенные в архив командой archive_orders, не возвращаются
     """
 
     throttle_scope = "user"
 
-    @extend_schema(responses=CategorySerializer)
+    def get_filter_query(self):
+        query = Q(user_id=self.request.user.id) & ~Q(status="basket")
+        date_from = self.request.query_params.get("date_from")
+        date_to = self.request.query_params.get("date_to")
+        order_status = self.request.query_params.get("status")
+
+        if date_from:
+            query = query & Q(dt__gte=parse_order_date(date_from))
+
+        if date_to:
+            query = query & Q(dt__lt=parse_order_date(date_to, end=True))
+
+        if order_status:
+            if order_status not in dict(STATUS_CHOICES) or order_status == "basket":
+                raise ValueError(order_status)
+            query = query & Q(status=order_status)
+
+        return query
+
+    # история заказов: ?date_from=&date_to=&status=&summary=1&cursor=
+    @extend_schema(responses=OrderSerializer)
     def get(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -467,29 +937,33 @@ class OrderView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        orders = (
-            Order.objects.filter(user_id=request.user.id)
-            .exclude(status="basket")
-            .select_related("contact")
-            .prefetch_related(
+        try:
+            query = self.get_filter_query()
+            summary = strtobool(request.query_params.get("summary", "false"))
+        except ValueError as error:
+            return JsonResponse(
+                {"Status": False, "Errors": f"Неверное значение фильтра: {error}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        orders = Order.objects.filter(query)
+        if summary:
+            serializer_class = OrderSummarySerializer
+        else:
+            serializer_class = OrderSerializer
+            orders = orders.select_related("contact").prefetch_related(
                 "ordered_items__product_info__product__category",
                 "ordered_items__product_info__product_parameters__parameter",
             )
-            .annotate(
-                total_quantity=Sum("ordered_items__quantity"),
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                ),
-            )
-            .distinct()
-        )
 
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     # Размещаем заказ из корзины и посылаем письмо об изменении статуса заказа.
     @extend_schema(responses=CategorySerializer)
+    @idempotent
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -499,67 +973,33 @@ class OrderView(APIView):
 
         order_id = request.data.get("id")
         if isinstance(order_id, int):
+            if redis_basket_enabled():
+                # корзина из Redis записывается в БД только при оформлении
+                redis_basket = RedisBasket(request.user.id)
+                redis_items = redis_basket.items()
+                redis_basket.materialize(redis_items)
+
             try:
-                order = Order.objects.get(
-                    id=order_id, user_id=request.user.id, status="basket"
-                )
-                order.contact_id = request.data.get("contact")
-                order.status = "new"
-                order.save()
-
-                # Получаем подробную информацию о заказе и его элементах
-                order_with_details = (
-                    Order.objects.filter(id=order.id, user_id=request.user.id)
-                    .select_related("contact")
-                    .prefetch_related(
-                        "ordered_items__product_info__product__category",
-                        "ordered_items__product_info__product_parameters__parameter",
+                with transaction.atomic():
+                    order = Order.objects.select_for_update().get(
+                        id=order_id, user_id=request.user.id, status="basket"
                     )
-                    .annotate(
-                        total_quantity=Sum("ordered_items__quantity"),
-                        total_sum=Sum(
-                            F("ordered_items__quantity")
-                            * F("ordered_items__product_info__price")
-                        ),
+                    # списываем товар со склада до смены статуса
+                    reserve_stock(order_quantities([order.id]))
+                    order.contact_id = request.data.get("contact")
+                    order.status = "new"
+                    order.save()
+                    record_order_changes([order.id])
+                    add_order_sales([order.id])
+
+                    # письма админу и покупателю отправит воркер после коммита
+                    enqueue_notifications(
+                        order_placed_notifications(order.id, request.user.email)
                     )
-                    .distinct()
-                    .first()
-                )
-
-                # Создаем объект EmailMultiAlternatives
-                admin_msg = EmailMultiAlternatives(
-                    "Подтверждение заказа админу",
-                    "Plain text content for admin",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.DEFAULT_FROM_EMAIL],
-                )
 
-                # Получаем HTML-версию тела письма из шаблона
-                admin_html_content = render_to_string(
-                    "email_templates/admin_email_template.html",
-                    {"order": order_with_details},
-                )
-
-                # Прикрепляем HTML-версию к объекту EmailMultiAlternatives
-                admin_msg.attach_alternative(admin_html_content, "text/html")
-
-                # Отправляем письмо
-                admin_msg.send()
-
-                # Аналогично для пользователя
-                client_msg = EmailMultiAlternatives(
-                    "Подтверждение заказа пользователю",
-                    "Plain text content for client",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [order.user.email],
-                )
-
-                client_html_content = render_to_string(
-                    "email_templates/client_email_template.html",
-                    {"order": order_with_details},
-                )
-                client_msg.attach_alternative(client_html_content, "text/html")
-                client_msg.send()
+                if redis_basket_enabled():
+                    # позиции, добавленные после записи в БД, остаются в корзине
+                    redis_basket.clear(redis_items)
 
             except Order.DoesNotExist:
                 return JsonResponse(
@@ -569,6 +1009,15 @@ class OrderView(APIView):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            except InsufficientStock as error:
+                return JsonResponse(
+                    {
+                        "Status": False,
+                        "Errors": "Недостаточно товара на складе",
+                        "product_info": error.product_info_ids,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
             except IntegrityError as error:
                 return JsonResponse(
                     {"Status": False, "Errors": "Неправильно указаны аргументы"},
@@ -586,6 +1035,193 @@ class OrderView(APIView):
             )
 
 
+class ReorderView(APIView):
+    """
+    Класс для повтора заказа: позиции прошлого заказа копируются
+    в корзину по текущим ценам. POST order/reorder {"id": <id заказа>}
+    """
+
+    throttle_scope = "user"
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Log in required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        order_id = request.data.get("id")
+        if not isinstance(order_id, int) or isinstance(order_id, bool):
+            return JsonResponse(
+                {"Status": False, "Errors": "Не указан id заказа"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if (
+            not Order.objects.filter(id=order_id, user_id=request.user.id)
+            .exclude(status="basket")
+            .exists()
+        ):
+            return JsonResponse(
+                {"Status": False, "Errors": "Заказ с указанным id не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if redis_basket_enabled():
+            copied, unavailable = reorder_into_redis_basket(order_id, request.user.id)
+        else:
+            basket, _ = Order.objects.get_or_create(
+                user_id=request.user.id, status="basket"
+            )
+            copied, unavailable = reorder_into_basket(order_id, basket)
+
+        return JsonResponse(
+            {"Status": True, "Создано объектов": copied, "unavailable": unavailable}
+        )
+
+
+class BulkOrderView(APIView):
+    """
+    Класс для размещения нескольких заказов одним запросом:
+    {"orders": [{"contact": 1, "items": [{"id": 1, "quantity": 2}]}]}
+    """
+
+    throttle_scope = "user"
+
+    @extend_schema(responses=OrderSummarySerializer)
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Log in required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        orders_data = request.data.get("orders")
+        if not isinstance(orders_data, list) or not orders_data:
+            return JsonResponse(
+                {"Status": False, "Errors": "Не указаны заказы"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        limit_error = JsonResponse(
+            {
+                "Status": False,
+                "Errors": f"Не больше {settings.ORDER_BULK_MAX_ORDERS} заказов "
+                f"и {settings.ORDER_BULK_MAX_ITEMS} позиций за запрос",
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+        if len(orders_data) > settings.ORDER_BULK_MAX_ORDERS:
+            return limit_error
+
+        # форму заказов проверяем до подсчета позиций и запросов к БД
+        errors = []
+        for number, order_data in enumerate(orders_data, start=1):
+            if not isinstance(order_data, dict) or not isinstance(
+                order_data.get("items"), list
+            ):
+                errors.append({"order": number, "Error": "Неверный формат данных"})
+                continue
+            errors.extend(
+                {"order": number, "line": line, "Error": "Неверный формат данных"}
+                for line, item in enumerate(order_data["items"], start=1)
+                if not isinstance(item, dict)
+            )
+        if errors:
+            return JsonResponse(
+                {"Status": False, "Errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if (
+            sum(len(order_data["items"]) for order_data in orders_data)
+            > settings.ORDER_BULK_MAX_ITEMS
+        ):
+            return limit_error
+
+        # товары и контакты всех заказов проверяются двумя запросами
+        product_ids = {
+            item.get("id") for order_data in orders_data for item in order_data["items"]
+        }
+        product_infos = {
+            product_info.product_id: product_info
+            for product_info in ProductInfo.objects.filter(
+                product_id__in=[
+                    product_id
+                    for product_id in product_ids
+                    if isinstance(product_id, int)
+                ]
+            ).only("id", "product_id", "price")
+        }
+        contact_ids = set(
+            Contact.objects.filter(user_id=request.user.id).values_list("id", flat=True)
+        )
+
+        orders = []
+        for number, order_data in enumerate(orders_data, start=1):
+            contact_id = order_data.get("contact")
+            if contact_id is not None and contact_id not in contact_ids:
+                errors.append(
+                    {"order": number, "Error": f"Контакт {contact_id} не найден"}
+                )
+
+            quantities, item_errors = resolve_basket_items(
+                order_data["items"], product_infos
+            )
+            if not quantities and not item_errors:
+                item_errors = [{"Error": "В заказе нет позиций"}]
+            errors.extend(dict(error, order=number) for error in item_errors)
+            orders.append((contact_id, quantities))
+
+        if errors:
+            return JsonResponse(
+                {"Status": False, "Errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                created = Order.objects.bulk_create(
+                    Order(user_id=request.user.id, contact_id=contact_id, status="new")
+                    for contact_id, _ in orders
+                )
+                OrderItem.objects.bulk_create(
+                    OrderItem(
+                        order=order,
+                        product_info=product_info,
+                        quantity=quantity,
+                        price=product_info.price,
+                        total_amount=product_info.price * quantity,
+                    )
+                    for order, (_, quantities) in zip(created, orders)
+                    for product_info, quantity in quantities.items()
+                )
+                order_ids = [order.id for order in created]
+                reserve_stock(order_quantities(order_ids))
+                refresh_order_totals(order_ids)
+                record_order_changes(order_ids)
+                add_order_sales(order_ids)
+                enqueue_notifications(
+                    notification
+                    for order_id in order_ids
+                    for notification in order_placed_notifications(
+                        order_id, request.user.email
+                    )
+                )
+        except InsufficientStock as error:
+            return JsonResponse(
+                {
+                    "Status": False,
+                    "Errors": "Недостаточно товара на складе",
+                    "product_info": error.product_info_ids,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return JsonResponse({"Status": True, "ids": order_ids})
+
+
 class ContactView(APIView):
     """
     Класс для работы с контактами покупателей
@@ -687,7 +1323,7 @@ class ContactView(APIView):
 
 class PartnerOrders(APIView):
     """
-    Класс для получения заказов поставщиками
+    Класс для получения заказов поставщиками (без архивных заказов)
     """
 
     throttle_scope = "user"
@@ -708,23 +1344,388 @@ class PartnerOrders(APIView):
 
         pr = Prefetch(
             "ordered_items",
-            queryset=OrderItem.objects.filter(shop__user_id=request.user.id),
+            queryset=OrderItem.objects.filter(
+                product_info__shop__user_id=request.user.id
+            ),
         )
         order = (
-            Order.objects.filter(ordered_items__shop__user_id=request.user.id)
+            Order.objects.filter(
+                ordered_items__product_info__shop__user_id=request.user.id
+            )
             .exclude(status="basket")
             .prefetch_related(pr)
             .select_related("contact")
-            .annotate(
-                total_sum=Sum("ordered_items__total_amount"),
-                total_quantity=Sum("ordered_items__quantity"),
-            )
+            .distinct()
         )
 
         serializer = OrderSerializer(order, many=True)
         return Response(serializer.data)
 
 
+class PartnerOrderFeed(APIView):
+    """
+    Лента заказов поставщика: заказы с его позициями, измененные после курсора.
+    GET partner/orders/feed?since=<курсор>&wait=<сек> ждет новых изменений
+    до wait секунд, если их еще нет
+    """
+
+    throttle_scope = "user"
+
+    @extend_schema(responses=OrderSerializer)
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Магазин не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        try:
+            since = int(request.query_params.get("since", 0))
+            wait = float(request.query_params.get("wait", 0))
+            # nan и inf не ограничиваются min/max и ждали бы бесконечно
+            if not math.isfinite(wait):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"Status": False, "Errors": "Неверный формат since или wait"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        wait = min(max(wait, 0), settings.ORDER_FEED_MAX_WAIT)
+        if wait:
+            wait_for_changes(shop.id, since, wait)
+
+        cursor, orders = get_order_feed(shop.id, since)
+        return Response(
+            {"cursor": cursor, "orders": OrderSerializer(orders, many=True).data}
+        )
+
+
+class PartnerOrderStatus(APIView):
+    """
+    Класс для смены статуса нескольких заказов поставщиком.
+    POST partner/orders/status {"ids": [1, 2], "status": "confirmed"}
+    """
+
+    throttle_scope = "user"
+
+    @extend_schema(responses=OrderSummarySerializer)
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Магазин не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        order_ids = request.data.get("ids")
+        new_status = request.data.get("status")
+        if (
+            not isinstance(order_ids, list)
+            or not order_ids
+            or not all(
+                isinstance(order_id, int) and not isinstance(order_id, bool)
+                for order_id in order_ids
+            )
+        ):
+            return Response(
+                {"Status": False, "Errors": "Не указаны id заказов"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(order_ids) > settings.ORDER_STATUS_BATCH_MAX:
+            return Response(
+                {
+                    "Status": False,
+                    "Errors": f"Не больше {settings.ORDER_STATUS_BATCH_MAX} "
+                    f"заказов за запрос",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not allowed_sources(new_status):
+            return Response(
+                {"Status": False, "Errors": f"Недопустимый статус {new_status}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        updated, errors = transition_orders(shop.id, order_ids, new_status)
+        return Response(
+            {
+                "Status": not errors,
+                "updated": updated,
+                "errors": [
+                    {"id": order_id, "Error": error}
+                    for order_id, error in errors.items()
+                ],
+            }
+        )
+
+
+class PartnerOrderExport(APIView):
+    """
+    Класс для выгрузки позиций заказов поставщика за период.
+    GET partner/orders/export?date_from=&date_to=&file_format=csv|xlsx.
+    Архивные заказы в выгрузку не попадают
+    """
+
+    throttle_scope = "user"
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Магазин не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        export_format = request.query_params.get("file_format", "csv")
+        if export_format not in ("csv", "xlsx"):
+            return Response(
+                {"Status": False, "Errors": "Поддерживаются форматы csv и xlsx"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        items = OrderItem.objects.filter(product_info__shop_id=shop.id).exclude(
+            order__status="basket"
+        )
+        try:
+            if request.query_params.get("date_from"):
+                items = items.filter(
+                    order__dt__gte=parse_order_date(request.query_params["date_from"])
+                )
+            if request.query_params.get("date_to"):
+                items = items.filter(
+                    order__dt__lt=parse_order_date(
+                        request.query_params["date_to"], end=True
+                    )
+                )
+        except ValueError as error:
+            return Response(
+                {"Status": False, "Errors": f"Неверное значение фильтра: {error}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # строки без создания моделей, пачками через серверный курсор
+        rows = (
+            dict(zip(ORDER_EXPORT_FIELDS, values))
+            for values in items.order_by("order__dt", "order_id", "id")
+            .values_list(
+                "order_id",
+                "order__dt",
+                "order__status",
+                "product_info_id",
+                "product_info__model",
+                "product_info__product__name",
+                "quantity",
+                "price",
+                "total_amount",
+            )
+            .iterator(chunk_size=settings.CATALOG_EXPORT_CHUNK_SIZE)
+        )
+        file_name = f"orders_{shop.id}.{export_format}"
+
+        if export_format == "xlsx":
+            # xlsx - это zip-архив, поэтому собирается во временном файле
+            file = tempfile.TemporaryFile()
+            write_xlsx(rows, ORDER_EXPORT_FIELDS, file)
+            file.seek(0)
+            return FileResponse(
+                file,
+                as_attachment=True,
+                filename=file_name,
+                content_type="application/vnd.openxmlformats-officedocument"
+                ".spreadsheetml.sheet",
+            )
+
+        response = StreamingHttpResponse(
+            iter_chunks(iter_csv(rows, ORDER_EXPORT_FIELDS)),
+            content_type="text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+
+
+class PartnerAnalytics(APIView):
+    """
+    Класс для получения отчета о продажах поставщика по дневным итогам.
+    GET partner/analytics?date_from=&date_to=&top=
+    """
+
+    throttle_scope = "user"
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Магазин не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        # по умолчанию - последние 30 дней
+        date_to = timezone.now().date()
+        date_from = date_to - timedelta(days=29)
+        try:
+            if request.query_params.get("date_to"):
+                date_to = parse_date(request.query_params["date_to"])
+            if request.query_params.get("date_from"):
+                date_from = parse_date(request.query_params["date_from"])
+            top = int(request.query_params.get("top", 10))
+            if date_from is None or date_to is None or date_from > date_to:
+                raise ValueError("date_from, date_to")
+            previous_period(date_from, date_to)
+        except (ValueError, OverflowError) as error:
+            return Response(
+                {"Status": False, "Errors": f"Неверное значение фильтра: {error}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            shop_sales_report(shop.id, date_from, date_to, min(max(top, 1), 100))
+        )
+
+
+class PartnerWebhookView(APIView):
+    """
+    Класс для регистрации webhook поставщика, на который
+    отправляются новые и измененные заказы его магазина
+    """
+
+    throttle_scope = "user"
+
+    def check_partner(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"Status": False, "Error": "Login required"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if request.user.type != "shop":
+            return Response(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        return None
+
+    @extend_schema(responses=PartnerWebhookSerializer)
+    def get(self, request, *args, **kwargs):
+        error = self.check_partner(request)
+        if error:
+            return error
+
+        webhook = PartnerWebhook.objects.filter(shop__user_id=request.user.id).first()
+        if webhook is None:
+            return Response(
+                {"Status": False, "Errors": "Webhook не зарегистрирован"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(PartnerWebhookSerializer(webhook).data)
+
+    # Зарегистрировать или изменить адрес. Ключ подписи выдается заново
+    @extend_schema(responses=PartnerWebhookSerializer)
+    def post(self, request, *args, **kwargs):
+        error = self.check_partner(request)
+        if error:
+            return error
+
+        shop = Shop.objects.filter(user_id=request.user.id).first()
+        if shop is None:
+            return Response(
+                {"Status": False, "Errors": "Магазин не найден"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = PartnerWebhookSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"Status": False, "Errors": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            check_webhook_url(serializer.validated_data["url"])
+        except UnsafeWebhookUrl as error:
+            return Response(
+                {"Status": False, "Errors": {"url": [str(error)]}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # новые заказы отправляются с текущего момента, без истории
+        webhook, _ = PartnerWebhook.objects.update_or_create(
+            shop=shop,
+            defaults={
+                "url": serializer.validated_data["url"],
+                "secret": secrets.token_hex(32),
+                "is_active": True,
+                "failures": 0,
+                "next_attempt_at": timezone.now(),
+                "last_change_id": last_cursor(shop.id),
+            },
+        )
+        data = PartnerWebhookSerializer(webhook).data
+        data["secret"] = webhook.secret
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(responses=PartnerWebhookSerializer)
+    def delete(self, request, *args, **kwargs):
+        error = self.check_partner(request)
+        if error:
+            return error
+
+        PartnerWebhook.objects.filter(shop__user_id=request.user.id).delete()
+        return Response({"Status": True})
+
+
 class PartnerState(APIView):
     """
     Класс для работы со статусом поставщика
@@ -772,13 +1773,21 @@ class PartnerState(APIView):
                 Shop.objects.filter(user_id=request.user.id).update(
                     state=strtobool(state)
                 )
-                return Response({"Status": True})
             except ValueError as error:
                 return Response(
                     {"Status": False, "Errors": str(error)},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+            # товары магазина появляются или пропадают из снимков каталога.
+            # Статус уже сохранен, поэтому при недоступном брокере снимки
+            # обновит следующая сборка
+            try:
+                build_catalog_snapshots.delay(request.user.shop.id)
+            except OperationalError as error:
+                logger.warning(f"Error scheduling catalog snapshots: {error}")
+            return Response({"Status": True})
+
         return Response(
             {"Status": False, "Errors": "Не указан аргумент state."},
             status=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,158 @@
+import hashlib
+import hmac
+import ipaddress
+import logging
+import socket
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from rest_framework.renderers import JSONRenderer
+
+from supplier.feed import change_key, get_order_feed, visible_changes
+from supplier.locks import acquire_cache_lock, release_cache_lock
+from supplier.models import OrderChange, PartnerWebhook
+from supplier.serializers import OrderSerializer
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+
+
+@lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """
+    Общая сессия воркера: соединения с поставщиками переиспользуются
+    между доставками вместо нового TCP/TLS-рукопожатия на каждый POST
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.WEBHOOK_POOL_SIZE,
+        pool_maxsize=settings.WEBHOOK_POOL_SIZE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def sign_payload(secret: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+class UnsafeWebhookUrl(Exception):
+    """
+    Адрес webhook не https или ведет во внутреннюю сеть
+    """
+
+
+def check_webhook_url(url: str) -> None:
+    """
+    Webhook принимается только на https и публичные адреса: иначе поставщик
+    мог бы заставить воркер обращаться к внутренним сервисам.
+    Имя хоста разрешается заново при каждой проверке
+    """
+    if not settings.WEBHOOK_REQUIRE_PUBLIC_HTTPS:
+        return
+
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise UnsafeWebhookUrl("Адрес webhook должен начинаться с https://")
+
+    try:
+        addresses = {
+            info[4][0]
+            for info in socket.getaddrinfo(
+                parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP
+            )
+        }
+    except (OSError, UnicodeError, ValueError):
+        raise UnsafeWebhookUrl(f"Не удалось определить адрес {parts.hostname}")
+
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise UnsafeWebhookUrl(
+                f"Адрес webhook ведет во внутреннюю сеть: {parts.hostname}"
+            )
+
+
+def due_webhooks():
+    """
+    Активные webhooks, у которых есть недоставленные изменения
+    и не идет пауза после ошибки
+    """
+    pending = OrderChange.objects.filter(
+        shop_id=OuterRef("shop_id"),
+        **{f"{change_key()}__gt": OuterRef("last_change_id")},
+    )
+    return PartnerWebhook.objects.filter(
+        Exists(pending), is_active=True, next_attempt_at__lte=timezone.now()
+    )
+
+
+def deliver_webhook(webhook_id: int) -> int:
+    """
+    Отправляем поставщику одну пачку изменений после его курсора.
+    Для одного магазина одновременно идет не больше одной доставки.
+    Возвращает количество доставленных заказов
+    """
+    lock = f"webhook:lock:{webhook_id}"
+    token = acquire_cache_lock(lock, settings.WEBHOOK_LOCK_TIMEOUT)
+    if token is None:
+        return 0
+
+    try:
+        webhook = PartnerWebhook.objects.get(id=webhook_id, is_active=True)
+        if not visible_changes(webhook.shop_id, webhook.last_change_id).exists():
+            return 0
+
+        cursor, orders = get_order_feed(webhook.shop_id, webhook.last_change_id)
+        body = JSONRenderer().render(
+            {"cursor": cursor, "orders": OrderSerializer(orders, many=True).data}
+        )
+        try:
+            # DNS поставщика мог измениться после регистрации
+            check_webhook_url(webhook.url)
+            response = get_session().post(
+                webhook.url,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    SIGNATURE_HEADER: sign_payload(webhook.secret, body),
+                },
+                timeout=settings.WEBHOOK_TIMEOUT,
+                allow_redirects=False,
+            )
+            response.raise_for_status()
+            if response.is_redirect:
+                raise UnsafeWebhookUrl("Webhook ответил перенаправлением")
+        except (requests.RequestException, UnsafeWebhookUrl) as error:
+            logger.warning(f"Error delivering webhook {webhook.id}: {error}")
+            failures = webhook.failures + 1
+            delay = min(
+                settings.WEBHOOK_RETRY_DELAY * 2 ** (failures - 1),
+                settings.WEBHOOK_MAX_RETRY_DELAY,
+            )
+            PartnerWebhook.objects.filter(id=webhook.id).update(
+                failures=failures,
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+                last_error=str(error),
+            )
+            return 0
+
+        PartnerWebhook.objects.filter(id=webhook.id).update(
+            last_change_id=cursor, failures=0, last_error=""
+        )
+        return len(orders)
+    except PartnerWebhook.DoesNotExist:
+        return 0
+    finally:
+        release_cache_lock(lock, token)